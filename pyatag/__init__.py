@@ -3,6 +3,8 @@
 __version__ = "0.3.7.1"
 
 from .errors import *  # noqa
+from .fleet import AtagFleet
 from .gateway import AtagOne
 
 assert AtagOne
+assert AtagFleet
@@ -0,0 +1,33 @@
+"""JSON encoding of device messages, using orjson when available."""
+import json
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+if orjson is not None:
+    dumps = orjson.dumps
+    loads = orjson.loads
+else:
+
+    def dumps(obj):
+        """Encode obj to compact JSON bytes."""
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    loads = json.loads
+
+
+@lru_cache(maxsize=None)
+def retrieve_body(mac, info):
+    """Return the encoded retrieve message for a mac address and info bitmask."""
+    return dumps(
+        {
+            "retrieve_message": {
+                "seqnr": 0,
+                "account_auth": {"user_account": "", "mac_address": mac},
+                "info": info,
+            }
+        }
+    )
@@ -10,6 +10,11 @@ CLASSES = {
     "hours": [None, "h", "mdi:clock"],
     "rate": [None, "%", "mdi:fire"],
 }
+# fields whose class is not given by the suffix of their id
+FIELD_CLASSES = {
+    "tout_avg": "temp",
+    "rel_mod_level": "rate",
+}
 
 SENSORS = {
     "burning_hours": "Burning Hours",
@@ -56,3 +61,31 @@ STATES = {
     "dhw_mode": {0: "performance", 1: "eco"},
 }
 DEFAULT_PORT = 10000
+EXPORTER_PORT = 9110
+
+# info bits of a retrieve message
+INFO_CONTROL = 1
+INFO_SCHEDULES = 2
+INFO_CONFIGURATION = 4
+INFO_REPORT = 8
+INFO_STATUS = 16
+INFO_WIFISCAN = 32
+INFO_DETAILS = 64
+INFO_DEFAULT = INFO_CONTROL | INFO_SCHEDULES | INFO_CONFIGURATION | INFO_DETAILS
+
+# polling interval in seconds per info bitmask
+POLL_INTERVALS = {
+    INFO_DETAILS: 10,
+    INFO_CONTROL: 30,
+    INFO_CONFIGURATION | INFO_SCHEDULES: 3600,
+}
+
+# request priorities, lower values are sent first
+PRIORITY_WRITE = 0
+PRIORITY_POLL = 1
+REQUEST_PRIORITIES = {"pair": PRIORITY_WRITE, "update": PRIORITY_WRITE}
+
+# fields that change on every poll and do not indicate activity
+VOLATILE_FIELDS = {"report_time", "date_time"}
+# fields whose movement means the boiler is active
+ACTIVITY_FIELDS = {"rel_mod_level"}
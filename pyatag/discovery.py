@@ -1,6 +1,7 @@
 """Automatic discovery of ATAG Thermostat on LAN."""
 import asyncio
 import socket
+import time
 
 from .const import _LOGGER
 from .errors import RequestError
@@ -9,12 +10,12 @@ ATAG_UDP_PORT = 11000
 LOCALHOST = "0.0.0.0"
 
 
-class Discovery(asyncio.DatagramProtocol):
-    """Discovery class."""
+class DiscoveryProtocol(asyncio.DatagramProtocol):
+    """Pass received broadcasts to a callback."""
 
-    def __init__(self):
-        """Start listener."""
-        self.data = asyncio.Future()
+    def __init__(self, callback):
+        """Initiate protocol."""
+        self._callback = callback
 
     def connection_made(self, transport):
         """Log connection made."""
@@ -22,25 +23,130 @@ class Discovery(asyncio.DatagramProtocol):
 
     def datagram_received(self, data, addr):
         """Record broadcasted data."""
-        self.data.set_result([data, addr])
+        self._callback(data, addr)
 
 
-async def async_discover_atag():
+class DiscoveredDevice:
+    """Thermostat seen on the local network."""
+
+    def __init__(self, host, device_id, seen):
+        """Initiate device record."""
+        self.host = host
+        self.device_id = device_id
+        self.first_seen = self.last_seen = seen
+
+    def __repr__(self):
+        """Return readable device record."""
+        return f"{self.device_id} at {self.host}"
+
+
+class Discovery:
+    """Listen for ATAG broadcasts and keep a table of devices on the LAN.
+
+    Devices not heard from for ttl seconds are dropped from the table.
+    Iterate with async for to receive new devices and devices that moved
+    to another address.
+    """
+
+    def __init__(self, ttl=300, port=ATAG_UDP_PORT):
+        """Initiate discovery without listening yet."""
+        self.ttl = ttl
+        self._port = port
+        self._devices = {}
+        self._queues = []
+        self._transport = None
+
+    async def start(self):
+        """Start listening for broadcasts."""
+        if self._transport is None:
+            loop = asyncio.get_running_loop()
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: DiscoveryProtocol(self._received),
+                local_addr=(LOCALHOST, self._port),
+                reuse_port=hasattr(socket, "SO_REUSEPORT"),
+            )
+        return self
+
+    def close(self):
+        """Stop listening."""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    @property
+    def devices(self):
+        """Return the devices seen within ttl, by device id."""
+        self._expire(time.time())
+        return dict(self._devices)
+
+    def _received(self, data, addr):
+        """Update the device table from a broadcast."""
+        # format: b'ONE xxxx-xxxx-xxxx_xx-xx-xxx-xxx (ST)'
+        fields = data.decode(errors="replace").split()
+        if len(fields) < 2 or fields[0] != "ONE":
+            return
+        now = time.time()
+        self._expire(now)
+        device = self._devices.get(fields[1])
+        if device is not None and device.host == addr[0]:
+            device.last_seen = now
+            return
+        if device is None:
+            device = DiscoveredDevice(addr[0], fields[1], now)
+            self._devices[device.device_id] = device
+        else:
+            device.host, device.last_seen = addr[0], now
+        _LOGGER.debug("Discovered %s", device)
+        for queue in self._queues:
+            queue.put_nowait(device)
+
+    def _expire(self, now):
+        """Drop devices not seen within ttl."""
+        for device_id in [
+            device_id
+            for device_id, device in self._devices.items()
+            if now - device.last_seen > self.ttl
+        ]:
+            del self._devices[device_id]
+
+    async def __aiter__(self):
+        """Yield new and changed devices."""
+        queue = asyncio.Queue()
+        self._queues.append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._queues.remove(queue)
+
+    async def __aenter__(self):
+        """Start listening on entering the context."""
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        """Stop listening on exit."""
+        self.close()
+
+
+async def async_discover_atag(timeout=30):
     """Discover Atag on local network."""
-    # return format: [b'ONE xxxx-xxxx-xxxx_xx-xx-xxx-xxx (ST)',
-    # ('xxx.xxx.x.x', xxxx)]
-    trans, proto = await asyncio.get_event_loop().create_datagram_endpoint(
-        Discovery, local_addr=(LOCALHOST, ATAG_UDP_PORT)
-    )
+    async with Discovery() as discovery:
+        try:
+            device = await asyncio.wait_for(_first(discovery), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise RequestError("Host discovery failed")
+    return device.host, device.device_id
+
+
+async def _first(discovery):
+    """Return the first device discovered, including those seen already."""
+    for device in discovery.devices.values():
+        return device
+    devices = discovery.__aiter__()
     try:
-        result = await asyncio.wait_for(proto.data, timeout=30)
-        host_ip = result[1][0]
-        device_id = result[0].decode().split()[1]
-        trans.close()
-    except asyncio.TimeoutError:
-        trans.close()
-        raise RequestError("Host discovery failed")
-    return host_ip, device_id
+        return await devices.__anext__()
+    finally:
+        await devices.aclose()
 
 
 def discover_atag():
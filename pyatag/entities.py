@@ -1,51 +1,122 @@
 """Classes within AtagOne object."""
-from datetime import datetime, timedelta
+from datetime import datetime
+from functools import partial
 
-from .const import CLASSES, SENSORS, STATES
+from . import errors
+from .const import _LOGGER, STATES
+from .schema import convert_time, field_key, get_field  # noqa: F401
 
-
-def convert_time(seconds, sensorclass="time"):
-    """Convert reported time to real time."""
-    if sensorclass == "duration":
-        return str(timedelta(seconds=seconds))
-    return str(datetime(2000, 1, 1) + timedelta(seconds=seconds))
+_UNSET = object()
 
 
 class Report:
     """Main object to hold report and control data."""
 
-    def __init__(self, data, update, setter):
+    def __init__(self, data, update, setter, listeners=None):
         """Initiate object for Sensor and Control data."""
         self._update = update
         self._setter = setter
         self._items = {}
+        self._raw = {}
         self._data = data
-        self._classes = CLASSES
-        self._classes["temp"][1] = STATES["temp_unit"][
-            self._data["configuration"]["temp_unit"]
-        ]
+        self._listeners = [] if listeners is None else listeners
+        self.changed = []
+        self.history = None
+        self._temp_unit = None  # unknown until the configuration is retrieved
         self._process_raw(self._data)
 
     def update(self, data):
-        """Process latest data."""
-        self._data = data
-        self._process_raw(self._data)
+        """Process latest data and notify subscribers of changes.
+
+        Partial replies only update the groups they contain.
+        """
+        for grp, values in data.items():
+            if isinstance(values, dict):
+                self._data.setdefault(grp, {}).update(values)
+            else:
+                self._data[grp] = values
+        self._process_raw(data)
+        if self.history is not None:
+            self.history.append(self)
+        self.notify()
+
+    def notify(self, changed=None):
+        """Call subscribers with changed objects, by default those of the last update."""
+        changed = self.changed if changed is None else changed
+        for listener in list(self._listeners):  # callbacks may unsubscribe
+            self._deliver(listener, changed)
+
+    @staticmethod
+    def _deliver(listener, changed):
+        """Call one subscriber with the changed objects it asked for."""
+        callback, ids = listener
+        if ids is not None:
+            changed = [obj for obj in changed if obj.id in ids]
+        if changed:
+            try:
+                callback(changed)
+            except Exception:  # a broken subscriber must not break updates
+                _LOGGER.exception("Error in change callback %s", callback)
+
+    def attach_history(self, history):
+        """Record every update into a History store, starting now."""
+        self.history = history
+        history.append(self)
+        return history
+
+    def subscribe(self, callback, ids=None, current=False):
+        """Call callback with the changed objects after each update.
+
+        Optionally only for the given sensor ids, and with current, right
+        away with all objects. Returns a function that removes the
+        subscription.
+        """
+        listener = (callback, None if ids is None else frozenset(ids))
+        self._listeners.append(listener)
+        if current:
+            self._deliver(listener, list(self))
+        return partial(self._listeners.remove, listener)
 
     def _process_raw(self, raw):
         """Push data to the sensor and control objects."""
+        items = self._items
+        raws = self._raw
+        changed = []
+        retuned = []
+        unit = raw.get("configuration", {}).get("temp_unit")
+        if unit is not None and STATES["temp_unit"][unit] != self._temp_unit:
+            self._temp_unit = STATES["temp_unit"][unit]
+            retuned = [obj for obj in items.values() if obj.sensorclass == "temperature"]
+            for obj in retuned:
+                obj._measure = self._temp_unit
         for grp in ["configuration", "status", "report", "control"]:
-            for _id, raw_i in raw[grp].items():
-                name = SENSORS.get(_id)
-                obj = self._items.get(name) or self._items.get(_id)
+            for _id, raw_i in raw.get(grp, {}).items():
+                field = get_field(_id)
+                obj = items.get(field.key)
 
                 if obj is not None:
+                    if obj.raw == raw_i:
+                        continue
                     obj.raw = raw_i
                 elif grp == "control":
-                    self._items[name or _id] = Control(
-                        _id, raw_i, self._classes, self._setter
+                    obj = items[field.key] = Control(
+                        field, raw_i, self._temp_unit, self._setter
                     )
                 else:
-                    self._items[name or _id] = Sensor(_id, raw_i, self._classes)
+                    obj = items[field.key] = Sensor(field, raw_i, self._temp_unit)
+                raws[_id] = raw_i
+                changed.append(obj)
+        changed += [obj for obj in retuned if obj not in changed]
+        self.changed = changed
+
+    @property
+    def data(self):
+        """Return the raw data merged from all updates."""
+        return self._data
+
+    def raw_values(self, ids):
+        """Return the raw values for a sequence of IDs, None if unknown."""
+        return list(map(self._raw.get, ids))
 
     def items(self):
         """Return the report objects."""
@@ -58,9 +129,11 @@ class Report:
 
     def __getitem__(self, obj_id):
         """Return selected sensor object by name or ID."""
-        if obj_id in SENSORS:
-            return self._items[SENSORS[obj_id]]
-        return self._items[obj_id]
+        return self._items[field_key(obj_id)]
+
+    def __contains__(self, obj_id):
+        """Return True if a sensor object with this name or ID is known."""
+        return field_key(obj_id) in self._items
 
     def __iter__(self):
         """Iterate over sensor and control objects."""
@@ -70,62 +143,57 @@ class Report:
 class Sensor:
     """Represents an Atag sensor."""
 
-    def __init__(self, _id, raw, classes):
-        """Initiate sensor object."""
-        self.id = _id
+    __slots__ = ("id", "_field", "_raw", "_state", "_measure")
+
+    def __init__(self, field, raw, temp_unit=None):
+        """Initiate sensor object from its field rules."""
+        self.id = field.id
+        self._field = field
         self.raw = raw
-        self._info = classes.get(self.id.split("_")[-1])
-        if _id == "tout_avg":
-            self._info = classes["temp"]
-        if _id == "rel_mod_level":
-            self._info = classes["rate"]
-        self._states = STATES.get(self.id)
+        self._measure = field.unit
+        if field.sensorclass == "temperature":
+            self._measure = temp_unit
+
+    @property
+    def raw(self):
+        """Return the raw value as reported by the device."""
+        return self._raw
+
+    @raw.setter
+    def raw(self, value):
+        """Store a new raw value and drop the decoded state."""
+        self._raw = value
+        self._state = _UNSET
 
     @property
     def name(self):
         """Return the readable name of the Sensor."""
-        return SENSORS.get(self.id) or self.id
+        return self._field.key
 
     @property
     def sensorclass(self):
         """Return the sensorclass if known."""
-        if self._info:
-            return self._info[0]
+        return self._field.sensorclass
 
     @property
     def state(self):
         """Return state, if known in readable format."""
-        if self.sensorclass in ["time", "duration"]:
-            return convert_time(self.raw, self.sensorclass)
-        if self.id == "boiler_status":
-            return {
-                "burner": self.raw & 8 == 8,
-                "dhw": self.raw & 4 == 4,
-                "ch": self.raw & 2 == 2,
-            }
-        if self.id == "download_url":
-            return self.raw.split("/")[-1]
-        if self._states is not None:
-            if isinstance(self._states[self.raw], dict):
-                return self._states[self.raw]["state"]
-            return self._states[self.raw]
-        return self.raw
+        if self._state is _UNSET:
+            decode = self._field.decode
+            self._state = self._raw if decode is None else decode(self._raw)
+        return self._state
 
     @property
     def icon(self):
         """Return the icon corresponding to the state."""
-        if self._info:
-            return self._info[2]
-        elif self._states and isinstance(self._states[self.raw], dict):
-            return self._states[self.raw]["icon"]
-        return None
+        if self._field.icons is not None:
+            return self._field.icons.get(self._raw)
+        return self._field.icon
 
     @property
     def measure(self):
         """Return the unit of measurement if known."""
-        if self._info:
-            return self._info[1]
-        return None
+        return self._measure
 
     def __repr__(self):
         """Return the name of the Sensor."""
@@ -135,9 +203,11 @@ class Sensor:
 class Control(Sensor):
     """Represents an Atag control."""
 
-    def __init__(self, _id, raw, classes, setter):
+    __slots__ = ("_setter", "_target", "_last_call")
+
+    def __init__(self, field, raw, temp_unit, setter):
         """Initiate Control object."""
-        super().__init__(_id, raw, classes)
+        super().__init__(field, raw, temp_unit)
         self._setter = setter
         self._target = None
         self._last_call = None
@@ -149,30 +219,38 @@ class Control(Sensor):
             if (datetime.utcnow() - self._last_call).total_seconds() < 15:
                 return self._target
             self._target = None
-        if self.sensorclass in ["time", "duration"]:
-            return convert_time(self.raw, self.sensorclass)
-        if self._states:
-            if isinstance(self._states[self.raw], dict):
-                return self._states[self.raw]["state"]
-            return self._states[self.raw]
-        if self.id == "dhw_mode_temp":
-            return self.raw % 150
-        return self.raw
+        return super().state
+
+    @property
+    def pending(self):
+        """Return True while a recently set target awaits confirmation."""
+        return (
+            self._target is not None
+            and (datetime.utcnow() - self._last_call).total_seconds() < 15
+        )
 
     async def set_state(self, target):
-        """Set the Control to a new target state."""
-        target_int = None
-        if self._states is not None:
-            target = {v.lower(): v for v in self._states.values()}.get(target.lower())
-            target_int = {v: k for k, v in self._states.items()}.get(target.lower())
+        """Set the Control to a new target state.
+
+        Returns the update_reply, or None inside AtagOne.batch().
+        """
+        value = target
+        if self._field.lookup is not None:
+            target = self._field.lookup.get(str(target).lower())
+            if target is None:
+                raise errors.RequestError(f"Invalid state {value!r} for {self.id}")
+            value = self._field.codes[target]
         if target == self.state:
             return True
         self._target = target
         self._last_call = datetime.utcnow()
-        return await self._setter(**{self.id: target_int})
+        return await self._setter(**{self.id: value})
 
     async def set_temp(self, target):
-        """Set the Control to a new target state."""
+        """Set the Control to a new target state.
+
+        Returns the update_reply, or None inside AtagOne.batch().
+        """
         if target == self.state:
             return True
         self._target = target
@@ -230,7 +308,7 @@ class Climate:
 
     async def set_hvac_mode(self, target: str) -> int:
         """Set the operating mode (Weather or Regular/Heat)."""
-        await self._report["ch_control_mode"].set_state(target)
+        return await self._report["ch_control_mode"].set_state(target)
 
     @property
     def preset_mode(self):
@@ -244,7 +322,7 @@ class Climate:
 
     async def set_preset_mode(self, target: str, **kwargs) -> int:
         """Set the hold mode (manual/automatic/extend/vacation/fireplace)."""
-        await self._report["ch_mode"].set_state(target)
+        return await self._report["ch_mode"].set_state(target)
 
     @property
     def temperature(self):
@@ -258,7 +336,7 @@ class Climate:
 
     async def set_temp(self, target: float):
         """Set target temperature."""
-        await self._report["ch_mode_temp"].set_temp(target)
+        return await self._report["ch_mode_temp"].set_temp(target)
 
 
 class DHW:
@@ -319,4 +397,4 @@ class DHW:
 
     async def set_temp(self, target: float):
         """Set dhw target temperature."""
-        await self._report["dhw_temp_setp"].set_temp(target)
+        return await self._report["dhw_temp_setp"].set_temp(target)
@@ -17,6 +17,10 @@ class ConnectionError(AtagException):
     """Unable to fulfill request."""
 
 
+class CircuitOpen(ConnectionError):
+    """Device is known to be unreachable."""
+
+
 class ResponseError(AtagException):
     """Invalid response."""
 
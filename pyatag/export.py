@@ -0,0 +1,127 @@
+"""Bulk columnar export of many reports."""
+from .schema import BIT_FIELDS, CLASS_DECODERS, get_field
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+class Exporter:
+    """Export selected fields of many reports as columns.
+
+    The field layout and decoders are compiled once. Each export reads
+    all raw values in one pass and decodes whole columns at a time, using
+    NumPy when it is installed. Decoded values equal Sensor.state with or
+    without NumPy, except that fields holding flags, like boiler_status,
+    are split into one boolean column per flag, like boiler_status_burner.
+    """
+
+    def __init__(self, fields, decode=True):
+        """Compile the column layout for the given field ids."""
+        self.fields = [get_field(_id) for _id in fields]
+        self._ids = [field.id for field in self.fields]
+        self.decode = decode
+
+    def columns(self, reports):
+        """Return a dict of columns by field id, one row per report."""
+        rows = [report.raw_values(self._ids) for report in reports]
+        raw_columns = zip(*rows) if rows else ([] for _ in self.fields)
+        columns = {}
+        for field, values in zip(self.fields, raw_columns):
+            bits = BIT_FIELDS.get(field.id) if self.decode else None
+            if bits is None:
+                columns[field.id] = self._column(field, list(values))
+                continue
+            for name, column in _flags(list(values), bits).items():
+                columns[f"{field.id}_{name}"] = column
+        return columns
+
+    def _column(self, field, values):
+        """Decode a single column."""
+        decode = field.decode if self.decode else None
+        if np is None:
+            if decode is None:
+                return values
+            return [None if value is None else decode(value) for value in values]
+        if decode is None:
+            return _array(values)
+        if field.sensorclass in CLASS_DECODERS or field.codes is not None:
+            try:
+                raw = np.array(values, dtype=float)
+            except (TypeError, ValueError):
+                pass
+            else:
+                # decode each distinct value once and gather by index
+                keys, index = np.unique(raw, return_inverse=True)
+                table = np.array(
+                    [None if key != key else decode(key) for key in keys.tolist()],
+                    dtype=object,
+                )
+                return table[index.reshape(-1)]
+        return _array([None if value is None else decode(value) for value in values])
+
+    def to_numpy(self, reports):
+        """Return a NumPy record array with one record per report."""
+        if np is None:
+            raise ImportError("NumPy is required for record array export")
+        columns = self.columns(reports)
+        return np.rec.fromarrays(list(columns.values()), names=list(columns))
+
+    def to_arrow(self, reports):
+        """Return a pyarrow Table with one row per report."""
+        import pyarrow
+
+        columns = self.columns(reports)
+        return pyarrow.table(
+            {
+                name: column.tolist() if _is_object(column) else column
+                for name, column in columns.items()
+            }
+        )
+
+
+def _array(values):
+    """Return values as a float array, or an object array if not numeric."""
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.array(values, dtype=object)
+
+
+def _flags(values, bits):
+    """Return one boolean column per flag of a raw column, None where missing."""
+    if np is None:
+        return {
+            name: [None if value is None else value & bit == bit for value in values]
+            for name, bit in bits.items()
+        }
+    raw = np.array(values, dtype=float)
+    missing = np.isnan(raw)
+    raw = np.where(missing, 0, raw).astype(int)
+    columns = {}
+    for name, bit in bits.items():
+        column = raw & bit == bit
+        columns[name] = np.where(missing, None, column) if missing.any() else column
+    return columns
+
+
+def _is_object(column):
+    """Return True for NumPy object columns, which Arrow cannot take as is."""
+    return getattr(column, "dtype", None) == object
+
+
+def export(reports, fields=None, decode=True, format="dict"):
+    """Export reports as columns: "dict", "numpy" or "arrow".
+
+    Fields default to all fields of the first report.
+    """
+    reports = list(reports)
+    if fields is None:
+        fields = [obj.id for obj in reports[0]] if reports else []
+    exporter = Exporter(fields, decode)
+    if format == "numpy":
+        return exporter.to_numpy(reports)
+    if format == "arrow":
+        return exporter.to_arrow(reports)
+    return exporter.columns(reports)
@@ -0,0 +1,134 @@
+"""Fleet manager polling many ATAG One thermostats over one shared session."""
+import asyncio
+import time
+
+import aiohttp
+
+from .const import _LOGGER, DEFAULT_PORT, INFO_DEFAULT
+from .gateway import AtagOne
+
+
+class FleetResult:
+    """Outcome of a single device call within a fleet sweep."""
+
+    def __init__(self, key, latency, error=None):
+        """Initiate result object."""
+        self.key = key
+        self.latency = latency
+        self.error = error
+
+    @property
+    def success(self):
+        """Return True if the device call completed without error."""
+        return self.error is None
+
+    def __repr__(self):
+        """Return readable result."""
+        status = "ok" if self.success else f"{type(self.error).__name__}: {self.error}"
+        return f"{self.key}: {status} ({self.latency:.3f}s)"
+
+
+class AtagFleet:
+    """Run AtagOne calls for many devices with bounded concurrency."""
+
+    def __init__(self, session=None, concurrency=100, timeout=30, transport="aiohttp"):
+        """Initialize fleet with an optional shared session."""
+        self._session = session
+        self._own_session = session is None
+        self._concurrency = concurrency
+        self._timeout = timeout
+        self._transport = transport
+        self._semaphore = None  # created in the running loop
+        self._devices = {}
+
+    @property
+    def session(self):
+        """Return the shared session, creating a tuned one if needed."""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self._concurrency,
+                limit_per_host=1,  # thermostats tolerate a single connection
+                ttl_dns_cache=None,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+            )
+        return self._session
+
+    def add(self, host, device=None, port=DEFAULT_PORT, key=None, **kwargs):
+        """Register a device and return its AtagOne object.
+
+        Extra keyword arguments are passed to AtagOne.
+        """
+        key = key or f"{host}:{port}"
+        if key not in self._devices:
+            session = self.session if self._transport == "aiohttp" else None
+            self._devices[key] = AtagOne(
+                host,
+                session,
+                device=device,
+                port=port,
+                transport=self._transport,
+                **kwargs,
+            )
+        return self._devices[key]
+
+    async def remove(self, key):
+        """Unregister and close a device."""
+        atag = self._devices.pop(key)
+        await atag.close()
+        return atag
+
+    async def sweep(self, func):
+        """Await func(atag) for every device and return results by key."""
+        results = await asyncio.gather(
+            *(self._call(key, atag, func) for key, atag in self._devices.items())
+        )
+        return {result.key: result for result in results}
+
+    async def update_all(self, info=INFO_DEFAULT):
+        """Update all registered devices."""
+        results = await self.sweep(lambda atag: atag.update(info))
+        failed = sum(not result.success for result in results.values())
+        _LOGGER.debug("Updated %s devices, %s failed", len(results), failed)
+        return results
+
+    async def _call(self, key, atag, func):
+        """Run one device call, capturing latency and errors."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        async with self._semaphore:
+            start = time.monotonic()
+            try:
+                await func(atag)
+            except Exception as err:  # report per device, never abort the sweep
+                return FleetResult(key, time.monotonic() - start, err)
+            return FleetResult(key, time.monotonic() - start)
+
+    async def close(self):
+        """Close all devices and the shared session if owned by the fleet."""
+        await asyncio.gather(*(atag.close() for atag in self._devices.values()))
+        if self._own_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        """Enter async context."""
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Close fleet on exit."""
+        await self.close()
+
+    def __getitem__(self, key):
+        """Return AtagOne object by key."""
+        return self._devices[key]
+
+    def __iter__(self):
+        """Iterate over registered AtagOne objects."""
+        return iter(self._devices.values())
+
+    def __len__(self):
+        """Return number of registered devices."""
+        return len(self._devices)
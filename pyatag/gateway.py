@@ -1,43 +1,120 @@
 """Gateway connecting to ATAG thermostat."""
 import asyncio
+import contextvars
+import itertools
 import re
 import socket  # together with your other imports
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+from functools import partial
 
 import aiohttp
 
 from . import __version__, errors
-from .const import _LOGGER
+from .codec import dumps, loads, retrieve_body
+from .const import (
+    _LOGGER,
+    DEFAULT_PORT,
+    INFO_DEFAULT,
+    PRIORITY_POLL,
+    REQUEST_PRIORITIES,
+)
 from .entities import DHW, Climate, Report
+from .pacing import TokenBucket
+from .polling import AdaptivePoller
+from .retry import CircuitBreaker, RetryPolicy
+from .scheduler import RequestScheduler
+from .transport import TRANSPORTS, AiohttpTransport
 
 USER_AGENT = "Mozilla/5.0 (compatible; AtagOneAPI/x; http://atag.one/)"
 REQUEST_HEADER_USER_AGENT = "User-Agent"
 REQUEST_HEADER_X_ONEAPP_VERSION = "X-OneApp-Version"
+REQUEST_HEADER_CONTENT_TYPE = "Content-Type"
+NO_RETRY = RetryPolicy(attempts=1, error_attempts=1)
+# pending batch() writes of the current task, by AtagOne object
+_BATCHES = contextvars.ContextVar("batches", default={})
 HEADERS = {
     REQUEST_HEADER_USER_AGENT: USER_AGENT,
     REQUEST_HEADER_X_ONEAPP_VERSION: f"{__package__}-{__version__}",
+    REQUEST_HEADER_CONTENT_TYPE: "application/json",
 }
 
 
 class AtagOne:
     """Central data store entity."""
 
-    def __init__(self, host, session=None, device=None, email=None, port=10000):
+    def __init__(
+        self,
+        host,
+        session=None,
+        device=None,
+        email=None,
+        port=10000,
+        write_delay=0,
+        pacer=None,
+        max_age=0,
+        retry=None,
+        breaker=None,
+        metrics=None,
+        transport="aiohttp",
+        trace=None,
+    ):
         """Initialize main AtagOne object."""
         del email  # email is not needed for local connections
         self.host = host
         self.port = port
+        self.address = f"{host}:{port}"
         self._device = device
         self._authorized = device is not None  # assume authorized if device id is known
         self._mac = "-".join(re.findall("..", "%012x" % uuid.getnode())).upper()
-        self._last_call = datetime(1970, 1, 1)
-        self._lock = asyncio.Lock()
-        self._session = session or aiohttp.ClientSession()
+        self._pacer = pacer or TokenBucket(rate=1.0, burst=1)
+        self._scheduler = RequestScheduler()
+        self._metrics = metrics
+        self._retry = retry or RetryPolicy()
+        self._breaker = breaker or CircuitBreaker()
+        if self._breaker.probe is None:
+            self._breaker.probe = self._probe
+        if isinstance(transport, str):
+            if transport == "aiohttp":
+                transport = AiohttpTransport(host, port, HEADERS, session)
+            else:
+                transport = TRANSPORTS[transport](host, port, HEADERS)
+        self._transport = transport
+        self._trace = trace
+        self._write_delay = write_delay
+        self._pending = None
+        self._flush_task = None
+        self._max_age = max_age
+        self._inflight = {}
+        self._updated = {}
+        self._listeners = []
+        self.replies = {}  # latest unmodified retrieve_reply per info bitmask
+        self._poller = None
+        self._poll_task = None
         self.climate = None
         self.dhw = None
         self.report = None
 
+    async def close(self):
+        """Stop polling, probing and pending writes and close the transport."""
+        self._breaker.close()
+        await self.stop_polling()
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._pending is not None:  # closed within the coalescing window
+            self._pending[1].set_exception(
+                errors.ConnectionError("Closed before sending writes")
+            )
+            self._pending = None
+        await self._transport.close()
+
     @property
     def id(self):
         """Return the ID of the bridge."""
@@ -51,6 +128,11 @@ class AtagOne:
         if self.report:
             return self.report["download_url"].state
 
+    @property
+    def request_stats(self):
+        """Return request queue depth and wait time statistics."""
+        return self._scheduler.stats
+
     @property
     def authorized(self):
         """Return authorization status."""
@@ -87,58 +169,328 @@ class AtagOne:
         return self.authorized
 
     async def request(self, path, json=None):
-        """Make a request to the API."""
-        url = f"http://{self.host}:{self.port}/{path}"
-        async with self._lock:
-            for tries in range(10):
-                await asyncio.sleep(
-                    1 - (datetime.utcnow() - self._last_call).total_seconds()
+        """Make a request to the API, json being a message or encoded bytes.
+
+        Writes and pairing are sent before queued polls, and identical
+        queued retrieve requests are merged.
+        """
+        self._breaker.check()
+        body = json if json is None or isinstance(json, bytes) else dumps(json)
+        key = (path, body) if path == "retrieve" else None
+        start = time.monotonic()
+        try:
+            data = await self._scheduler.run(
+                REQUEST_PRIORITIES.get(path, PRIORITY_POLL),
+                partial(self._send, path, body, self._retry, start),
+                key,
+            )
+        finally:
+            if self._metrics is not None:
+                self._metrics.observe(
+                    self.address, path, "total", time.monotonic() - start
                 )
-                self._last_call = datetime.utcnow()
-                _LOGGER.debug(f"Call {tries+1} to {self.host} for {path}")
-                try:
-                    async with self._session.post(
-                        url, headers=HEADERS, json=json
-                    ) as res:
-                        self.authorized = data = await res.json()
-                        return data
-                except (
-                    aiohttp.ServerDisconnectedError,
-                    aiohttp.ClientError,
-                    asyncio.CancelledError,
-                ) as err:
-                    if tries < 9 and isinstance(err, aiohttp.ServerDisconnectedError):
-                        continue
-                    raise errors.ConnectionError(
-                        f"Giving up after {type(err).__name__} (attempts: {tries+1})"
-                    ) from err
-
-    async def update(self, info=71):
-        """Get latest data from API."""
+        return data
+
+    async def _probe(self):
+        """Check whether an unreachable device answers again."""
+        await self._scheduler.run(
+            PRIORITY_POLL,
+            partial(self._send, "retrieve", self._retrieve_message(0), NO_RETRY),
+        )
+
+    async def _send(self, path, data, retry, queued=None):
+        """Send a request, retrying failures according to the retry policy.
+
+        Only the first attempt waits for the pacer; retries are spaced by the
+        backoff of the retry policy. The outcome is recorded once in the
+        circuit breaker, however many merged callers wait for it.
+        """
+        metrics = self._metrics
+        if metrics is not None and queued is not None:
+            metrics.observe(self.address, path, "queue", time.monotonic() - queued)
+        for tries in itertools.count():  # until the retry policy gives up
+            start = time.monotonic()
+            if not tries:
+                await self._pacer.acquire()
+            sent = time.monotonic()
+            _LOGGER.debug(f"Call {tries+1} to {self.host} for {path}")
+            try:
+                body = await self._transport.post(path, data)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                disconnected = isinstance(err, aiohttp.ServerDisconnectedError)
+                self._pacer.record(time.monotonic() - sent, disconnected)
+                if self._trace is not None:
+                    self._trace.record(
+                        self.host,
+                        self.port,
+                        path,
+                        tries,
+                        data,
+                        None,
+                        time.monotonic() - sent,
+                        err,
+                    )
+                if metrics is not None:
+                    metrics.count(self.address, path, "attempts")
+                    metrics.count(self.address, path, "errors")
+                    if disconnected:
+                        metrics.count(self.address, path, "disconnects")
+                if retry.retry(err, tries):
+                    delay = retry.delay(tries)
+                    if metrics is not None:
+                        metrics.observe(self.address, path, "backoff", delay)
+                    await asyncio.sleep(delay)
+                    continue
+                self._breaker.failure()
+                raise errors.ConnectionError(
+                    f"Giving up after {type(err).__name__} (attempts: {tries+1})"
+                ) from err
+            received = time.monotonic()
+            self._breaker.success()
+            self._pacer.record(received - sent)
+            if self._trace is not None:
+                self._trace.record(
+                    self.host, self.port, path, tries, data, body, received - sent
+                )
+            try:
+                reply = loads(body)
+            except ValueError as err:
+                raise errors.ResponseError(f"Invalid response from {path}") from err
+            if metrics is not None:
+                metrics.observe(self.address, path, "pace", sent - start)
+                metrics.observe(self.address, path, "http", received - sent)
+                metrics.observe(self.address, path, "decode", time.monotonic() - received)
+                metrics.count(self.address, path, "attempts")
+                metrics.count(self.address, path, "bytes", len(body))
+            try:
+                self.authorized = reply
+            except errors.Unauthorized:
+                if metrics is not None:
+                    metrics.count(self.address, path, "unauthorized")
+                raise
+            return reply
+
+    async def update(self, info=INFO_DEFAULT, max_age=None):
+        """Get latest data from API.
+
+        Concurrent calls share a single in-flight request, and data younger
+        than max_age seconds is returned without contacting the device.
+        """
+        max_age = self._max_age if max_age is None else max_age
+        if time.monotonic() - self._updated.get(info, -max_age) < max_age:
+            return True
+        if info not in self._inflight:
+            task = asyncio.ensure_future(self._update(info))
+            task.add_done_callback(partial(self._update_done, info))
+            self._inflight[info] = task
+        return await asyncio.shield(self._inflight[info])
+
+    def _update_done(self, info, task):
+        """Release the in-flight request and record successful updates."""
+        del self._inflight[info]
+        if not task.cancelled() and task.exception() is None:
+            self._updated[info] = time.monotonic()
+
+    async def _update(self, info):
+        """Retrieve and process the latest data."""
         if not self.authorized:
             await self.authorize()
-        json = {
-            "retrieve_message": {
-                "seqnr": 0,
-                "account_auth": {"user_account": "", "mac_address": self._mac},
-                "info": info,
-            }
-        }
-        res = await self.request("retrieve", json)
-        res = res["retrieve_reply"]
-        res["report"].update(res["report"].pop("details"))
+        res = await self.request("retrieve", self._retrieve_message(info))
+        res = self.replies[info] = res["retrieve_reply"]
+        if "details" in res.get("report", {}):
+            report = dict(res["report"])
+            report.update(report.pop("details"))
+            res = {**res, "report": report}
+        start = time.monotonic()
+        self._load(res)
+        if self._metrics is not None:
+            self._metrics.observe(
+                self.address, "retrieve", "process", time.monotonic() - start
+            )
+        return True
+
+    def _load(self, res):
+        """Create or update the report objects from a retrieve reply."""
         if self.report is None:
-            self.report = Report(res, self.update, self.setter)
+            res = {
+                grp: dict(values) if isinstance(values, dict) else values
+                for grp, values in res.items()
+            }
+            self.report = Report(res, self.update, self.setter, self._listeners)
             self.climate = Climate(self.report)
             self.dhw = DHW(self.report)
+            self.report.notify()
         else:
             self.report.update(res)
-        return True
+
+    def snapshot(self):
+        """Return a JSON serializable snapshot of device and report state."""
+        data = None
+        if self.report is not None:
+            data = {
+                grp: dict(values) if isinstance(values, dict) else values
+                for grp, values in self.report.data.items()
+            }
+        return {
+            "host": self.host,
+            "port": self.port,
+            "device": self.id,
+            "authorized": self._authorized,
+            "retrieve_reply": data,
+        }
+
+    def restore(self, snapshot, refresh=True):
+        """Load report state from a snapshot, optionally refreshing it.
+
+        Report, climate and dhw are usable immediately. With refresh, an
+        update runs in the background and its task is returned.
+        """
+        self._device = snapshot.get("device") or self._device
+        self._authorized = snapshot.get("authorized", self._device is not None)
+        if snapshot.get("retrieve_reply"):
+            self._load(snapshot["retrieve_reply"])
+        if refresh:
+            return asyncio.ensure_future(self._refresh())
+
+    async def _refresh(self):
+        """Update in the background, logging failures."""
+        try:
+            await self.update()
+        except errors.AtagException as err:
+            _LOGGER.warning("Refreshing %s failed: %s", self.host, err)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, session=None, refresh=True, **kwargs):
+        """Create an AtagOne object from a snapshot."""
+        atag = cls(
+            snapshot["host"],
+            session,
+            device=snapshot.get("device"),
+            port=snapshot.get("port", DEFAULT_PORT),
+            **kwargs,
+        )
+        atag.restore(snapshot, refresh)
+        return atag
+
+    def start_polling(self, min_interval=5, max_interval=300, backoff=2, fields=()):
+        """Start an adaptive polling loop and return its task.
+
+        Changes of the given fields also count as activity.
+        """
+        if self._poll_task is None or self._poll_task.done():
+            self._poller = AdaptivePoller(
+                self, min_interval, max_interval, backoff, fields=fields
+            )
+            self._poll_task = asyncio.ensure_future(self._poller.run())
+        return self._poll_task
+
+    async def stop_polling(self):
+        """Stop the adaptive polling loop."""
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+        self._poller = self._poll_task = None
+
+    def subscribe(self, callback, ids=None, current=False):
+        """Call callback with changed report objects after each update.
+
+        The first update delivers all objects. With current, a report that
+        is already loaded is delivered right away.
+        """
+        if self.report is not None:
+            return self.report.subscribe(callback, ids, current)
+        listener = (callback, None if ids is None else frozenset(ids))
+        self._listeners.append(listener)
+        return partial(self._listeners.remove, listener)
+
+    async def watch(self, ids=None):
+        """Yield changed report objects as updates arrive."""
+        queue = asyncio.Queue()
+        unsubscribe = self.subscribe(queue.put_nowait, ids)
+        try:
+            while True:
+                for obj in await queue.get():
+                    yield obj
+        finally:
+            unsubscribe()
 
     async def setter(self, **kwargs):
-        """Set control items."""
-        if not self.authorized:
-            await self.authorize()
+        """Set control items.
+
+        Writes issued within write_delay seconds of each other are sent as one
+        update message and every caller receives the shared update_reply.
+        Inside a batch() block of the calling task None is returned, as the
+        message is only sent when the block exits.
+        """
+        batch = _BATCHES.get().get(self)
+        if batch is not None:
+            batch[0].update(kwargs)
+            return None
+        if self._pending is None:
+            self._pending = ({}, asyncio.get_running_loop().create_future())
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+        controls, future = self._pending
+        controls.update(kwargs)
+        return await asyncio.shield(future)
+
+    @asynccontextmanager
+    async def batch(self):
+        """Collect control writes of this task in this block as one update.
+
+        Yields a future that holds the update_reply once the block exits.
+        """
+        batches = _BATCHES.get()
+        if self in batches:  # nested blocks join the outer batch
+            yield batches[self][1]
+            return
+        controls = {}
+        future = asyncio.get_running_loop().create_future()
+        token = _BATCHES.set({**batches, self: (controls, future)})
+        try:
+            yield future
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            _BATCHES.reset(token)
+        if controls:
+            await self._flush(controls, future)
+            future.result()
+
+    async def _flush_later(self):
+        """Send pending writes after the coalescing window."""
+        await asyncio.sleep(self._write_delay)
+        controls, future = self._pending
+        self._pending = None
+        try:
+            await self._flush(controls, future)
+        finally:
+            if not future.done():  # cancelled while sending
+                future.set_exception(
+                    errors.ConnectionError("Closed while sending writes")
+                )
+
+    async def _flush(self, controls, future):
+        """Send control writes in a single update message and resolve future."""
+        try:
+            if not self.authorized:
+                await self.authorize()
+            res = await self.request("update", self._update_message(controls))
+            future.set_result(res["update_reply"])
+            if self._poller is not None:
+                self._poller.wake()
+        except Exception as err:
+            future.set_exception(err)
+
+    def _retrieve_message(self, info):
+        """Return the encoded retrieve message for the given info bitmask."""
+        return retrieve_body(self._mac, info)
+
+    def _update_message(self, controls):
+        """Build update message for the given control items."""
         json = {
             "update_message": {
                 "seqnr": 0,
@@ -148,7 +500,7 @@ class AtagOne:
             }
         }
 
-        for key, val in kwargs.items():
+        for key, val in controls.items():
             json["update_message"]["control"][key] = val
             if key == "ch_mode" and val == 3:
                 json["update_message"]["control"]["vacation_duration"] = int(
@@ -157,5 +509,4 @@ class AtagOne:
                 json["update_message"]["configuration"]["start_vacation"] = int(
                     (datetime.utcnow() - datetime(2000, 1, 1)).total_seconds()
                 )
-        res = await self.request("update", json)
-        return res["update_reply"]
+        return json
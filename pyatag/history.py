@@ -0,0 +1,126 @@
+"""Bounded in-memory history of report values."""
+import math
+import time
+from array import array
+from bisect import bisect_left
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+DEFAULT_FIELDS = (
+    "room_temp",
+    "outside_temp",
+    "ch_water_temp",
+    "ch_return_temp",
+    "ch_water_pres",
+    "rel_mod_level",
+    "boiler_status",
+)
+
+
+class History:
+    """Fixed-size ring buffers holding the latest raw values per field.
+
+    Every append stores one sample for all fields, so memory stays at
+    size samples per field. Buffers are NumPy arrays when NumPy is
+    installed and array.array otherwise; typecode "f" halves memory.
+    """
+
+    def __init__(self, fields=DEFAULT_FIELDS, size=1024, typecode="d"):
+        """Initiate empty buffers."""
+        self.fields = tuple(fields)
+        self.size = size
+        self._pos = 0
+        self._count = 0
+        self._times = self._buffer("d")
+        self._values = {field: self._buffer(typecode) for field in self.fields}
+
+    def _buffer(self, typecode):
+        """Return a zeroed buffer of the ring size."""
+        if np is not None:
+            return np.zeros(self.size, dtype=typecode)
+        return array(typecode, bytes(array(typecode).itemsize * self.size))
+
+    def __len__(self):
+        """Return the number of samples held."""
+        return self._count
+
+    def append(self, report, now=None):
+        """Store the current raw values of the report as one sample."""
+        pos = self._pos
+        self._times[pos] = time.time() if now is None else now
+        for field, buffer in self._values.items():
+            raw = report[field].raw if field in report else None
+            buffer[pos] = math.nan if raw is None else raw
+        self._pos = (pos + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+
+    def window(self, field, seconds=None, now=None):
+        """Return times and values of a field, oldest first.
+
+        Limited to the last seconds if given.
+        """
+        times = self._ordered(self._times)
+        values = self._ordered(self._values[field])
+        if seconds is not None:
+            start = (time.time() if now is None else now) - seconds
+            if np is not None:
+                first = int(np.searchsorted(times, start))
+            else:
+                first = bisect_left(times, start)
+            times, values = times[first:], values[first:]
+        return times, values
+
+    def _ordered(self, buffer):
+        """Return the filled part of a ring buffer in chronological order."""
+        if self._count < self.size:
+            return buffer[: self._count]
+        if np is not None:
+            return np.concatenate((buffer[self._pos :], buffer[: self._pos]))
+        return buffer[self._pos :] + buffer[: self._pos]
+
+    def _valid(self, field, seconds, now):
+        """Return the non-missing values of a field within the window."""
+        _, values = self.window(field, seconds, now)
+        if np is not None:
+            return values[~np.isnan(values)]
+        return [value for value in values if value == value]
+
+    def mean(self, field, seconds=None, now=None):
+        """Return the mean value within the window."""
+        values = self._valid(field, seconds, now)
+        if not len(values):
+            return None
+        return float(values.mean()) if np is not None else sum(values) / len(values)
+
+    def min(self, field, seconds=None, now=None):
+        """Return the minimum value within the window."""
+        values = self._valid(field, seconds, now)
+        if not len(values):
+            return None
+        return float(values.min()) if np is not None else min(values)
+
+    def max(self, field, seconds=None, now=None):
+        """Return the maximum value within the window."""
+        values = self._valid(field, seconds, now)
+        if not len(values):
+            return None
+        return float(values.max()) if np is not None else max(values)
+
+    def rate(self, field, seconds=None, now=None):
+        """Return the change per second between first and last sample."""
+        times, values = self.window(field, seconds, now)
+        if len(times) < 2 or times[-1] == times[0]:
+            return None
+        return float((values[-1] - values[0]) / (times[-1] - times[0]))
+
+    def duty_cycle(self, bit=8, seconds=None, now=None, field="boiler_status"):
+        """Return the fraction of samples with a status bit set (8: burner)."""
+        values = self._valid(field, seconds, now)
+        if not len(values):
+            return None
+        if np is not None:
+            return float(np.count_nonzero(values.astype(np.int64) & bit) / len(values))
+        return sum(1 for value in values if int(value) & bit) / len(values)
@@ -0,0 +1,100 @@
+"""Request instrumentation for ATAG One gateways."""
+from bisect import bisect_left
+
+# upper bounds in seconds of the histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+class Histogram:
+    """Bucketed distribution of observed durations."""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets=BUCKETS):
+        """Initiate empty histogram."""
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """Add an observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        """Return the mean of all observations."""
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        """Return the upper bucket bound containing quantile q."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max)
+        return 0.0
+
+    def __repr__(self):
+        """Return summary of the histogram."""
+        return (
+            f"count={self.count} mean={self.mean:.4f} "
+            f"p50={self.quantile(0.5):.4f} p99={self.quantile(0.99):.4f} "
+            f"max={self.max:.4f}"
+        )
+
+
+class Metrics:
+    """Collect per-phase timings and counters of device requests.
+
+    Timings are kept per (device, path, phase) and counters per
+    (device, path, name), the device being its host:port address. Hooks
+    are called as hook(device, path, name, value) for every timing and
+    counter.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        """Initiate empty metrics store."""
+        self._buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self.hooks = []
+
+    def observe(self, device, path, phase, seconds):
+        """Record the duration of a request phase."""
+        key = (device, path, phase)
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = Histogram(self._buckets)
+        hist.observe(seconds)
+        for hook in self.hooks:
+            hook(device, path, phase, seconds)
+
+    def count(self, device, path, name, value=1):
+        """Increase a counter."""
+        key = (device, path, name)
+        self.counters[key] = self.counters.get(key, 0) + value
+        for hook in self.hooks:
+            hook(device, path, name, value)
+
+    def histogram(self, device, path, phase):
+        """Return the histogram for a request phase, if recorded."""
+        return self.histograms.get((device, path, phase))
+
+    def slowest(self, phase="total", n=10):
+        """Return the n (device, path) pairs with the highest mean duration."""
+        ranked = sorted(
+            (
+                (hist.mean, device, path)
+                for (device, path, name), hist in self.histograms.items()
+                if name == phase
+            ),
+            reverse=True,
+        )
+        return [(device, path, mean) for mean, device, path in ranked[:n]]
@@ -0,0 +1,168 @@
+"""OpenMetrics exporter serving cached fleet state."""
+import asyncio
+import time
+from functools import partial
+
+from aiohttp import web
+
+from .const import _LOGGER, EXPORTER_PORT, INFO_DEFAULT, VOLATILE_FIELDS
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+class OpenMetricsExporter:
+    """Serve the numeric report values of a fleet as OpenMetrics text.
+
+    A background loop updates the fleet every interval seconds, and scrapes
+    only read the cached text, so device load does not depend on how often
+    or by how many scrapers it is read. Samples are labelled with device id
+    and address and stamped with the time of the last successful update of
+    their device. Subscriptions re-render only the samples of changed
+    report objects; the body is joined again on the next scrape.
+    """
+
+    def __init__(self, fleet, interval=30, info=INFO_DEFAULT, prefix="atag"):
+        """Initiate exporter for an AtagFleet or other iterable of AtagOne."""
+        self._fleet = fleet
+        self.interval = interval
+        self.info = info
+        self.prefix = prefix
+        self._devices = {}  # AtagOne -> (labels, unsubscribe)
+        self._families = {}  # metric name -> {labels: sample without timestamp}
+        self._help = {}
+        self._stamps = {}
+        self._up = {}
+        self._body = None
+        self._task = None
+        self._runner = None
+
+    def _labels(self, atag):
+        """Return the label text of a device."""
+        return f'device="{atag.id or ""}",host="{atag.host}:{atag.port}"'
+
+    def _track(self, atag):
+        """Return the labels of a device, rendering all samples when new."""
+        labels = self._labels(atag)
+        known = self._devices.get(atag)
+        if known is not None and known[0] == labels:
+            return labels
+        if known is not None:
+            known[1]()
+            self._forget(known[0])
+        unsubscribe = atag.subscribe(partial(self._changed, labels), current=True)
+        self._devices[atag] = (labels, unsubscribe)
+        return labels
+
+    def _forget(self, labels):
+        """Drop all samples of a device."""
+        for samples in self._families.values():
+            samples.pop(labels, None)
+        self._stamps.pop(labels, None)
+        self._up.pop(labels, None)
+        self._body = None
+
+    def _changed(self, labels, changed):
+        """Render the samples of changed report objects."""
+        for obj in changed:
+            raw = obj.raw
+            if obj.id in VOLATILE_FIELDS or not isinstance(raw, (int, float)):
+                continue
+            name = f"{self.prefix}_{obj.id}"
+            samples = self._families.get(name)
+            if samples is None:
+                samples = self._families[name] = {}
+                self._help[name] = obj.name.replace("_", " ")
+            samples[labels] = f"{name}{{{labels}}} {raw}"
+        self._body = None
+
+    async def poll(self):
+        """Update all devices once and record which ones answered."""
+        devices = list(self._fleet)
+        if hasattr(self._fleet, "update_all"):
+            results = (await self._fleet.update_all(self.info)).values()
+            errors = [result.error for result in results]
+        else:
+            errors = await asyncio.gather(
+                *(atag.update(self.info) for atag in devices), return_exceptions=True
+            )
+            errors = [err if isinstance(err, Exception) else None for err in errors]
+        now = time.time()
+        for atag, error in zip(devices, errors):
+            labels = self._track(atag)
+            self._up[labels] = int(error is None and atag.report is not None)
+            if self._up[labels]:
+                self._stamps[labels] = now
+        for atag in [atag for atag in self._devices if atag not in devices]:
+            labels, unsubscribe = self._devices.pop(atag)
+            unsubscribe()
+            self._forget(labels)
+        self._body = None
+
+    async def run(self):
+        """Poll until cancelled."""
+        while True:
+            start = time.monotonic()
+            try:
+                await self.poll()
+            except Exception:  # keep serving the last known state
+                _LOGGER.exception("Polling fleet for metrics failed")
+            await asyncio.sleep(max(0, self.interval - (time.monotonic() - start)))
+
+    def render(self):
+        """Return the exposition as bytes, rebuilt only after changes."""
+        if self._body is None:
+            stamps = self._stamps
+            up = f"{self.prefix}_up"
+            lines = [f"# TYPE {up} gauge", f"# HELP {up} last update succeeded"]
+            lines += [f"{up}{{{labels}}} {value}" for labels, value in self._up.items()]
+            for name, samples in self._families.items():
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines += [
+                    f"{sample} {stamps[labels]:.3f}"
+                    for labels, sample in samples.items()
+                    if labels in stamps
+                ]
+            lines.append("# EOF\n")
+            self._body = "\n".join(lines).encode()
+        return self._body
+
+    async def _handle(self, request):
+        """Answer a scrape from the cache."""
+        return web.Response(body=self.render(), headers={"Content-Type": CONTENT_TYPE})
+
+    async def start(self, host="0.0.0.0", port=EXPORTER_PORT, path="/metrics"):
+        """Start polling and serving the metrics endpoint."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self.run())
+        app = web.Application()
+        app.router.add_get(path, self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        _LOGGER.debug("Serving metrics on %s:%s%s", host, port, path)
+        return self
+
+    async def stop(self):
+        """Stop serving and polling."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for _, unsubscribe in self._devices.values():
+            unsubscribe()
+        self._devices.clear()
+
+    async def __aenter__(self):
+        """Start on entering the context."""
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        """Stop on exit."""
+        await self.stop()
@@ -0,0 +1,87 @@
+"""Request pacing policies for ATAG One devices."""
+import asyncio
+import time
+
+
+class Pacer:
+    """Base pacing policy: no delay between requests."""
+
+    async def acquire(self):
+        """Wait until the next request may be sent."""
+
+    def record(self, latency, disconnected=False):
+        """Learn from the outcome of a request."""
+
+
+class TokenBucket(Pacer):
+    """Enforce an average request rate while allowing short bursts."""
+
+    def __init__(self, rate=1.0, burst=1):
+        """Initiate bucket with rate in requests per second."""
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._stamp = time.monotonic()
+
+    async def acquire(self):
+        """Take a token, sleeping until one is available."""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._stamp) * self.rate
+            )
+            self._stamp = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AdaptivePacer(Pacer):
+    """Learn the safe request interval from disconnects and response times.
+
+    The interval grows multiplicatively when the device drops a connection or
+    answers much slower than usual, and shrinks gradually while it keeps up.
+    """
+
+    def __init__(
+        self,
+        interval=0.2,
+        min_interval=0.0,
+        max_interval=5.0,
+        backoff=2.0,
+        recovery=0.9,
+        slow_factor=3.0,
+    ):
+        """Initiate pacer with a starting interval in seconds."""
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._backoff = backoff
+        self._recovery = recovery
+        self._slow_factor = slow_factor
+        self._latency = None
+        self._last_call = 0.0
+
+    async def acquire(self):
+        """Wait until the learned interval has passed since the last request."""
+        await asyncio.sleep(self.interval - (time.monotonic() - self._last_call))
+        self._last_call = time.monotonic()
+
+    def record(self, latency, disconnected=False):
+        """Adjust the interval to the outcome of the last request."""
+        slow = self._latency is not None and (
+            latency > self._slow_factor * self._latency
+        )
+        if disconnected or slow:
+            self.interval = min(
+                self.max_interval, max(self.interval, 0.1) * self._backoff
+            )
+        else:
+            self.interval = max(self.min_interval, self.interval * self._recovery)
+        if disconnected:
+            return
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency = 0.8 * self._latency + 0.2 * latency
@@ -0,0 +1,120 @@
+"""Polling schedules for ATAG One devices."""
+import asyncio
+import time
+
+from .const import _LOGGER, ACTIVITY_FIELDS, INFO_DEFAULT, POLL_INTERVALS
+from .errors import AtagException
+
+
+class PollScheduler:
+    """Poll each info group of an AtagOne at its own cadence.
+
+    Groups that are due together are combined into a single retrieve
+    request, and the partial replies are merged into the existing Report.
+    Groups stay due until they are retrieved; after a failed poll all of
+    them are tried again after the shortest interval.
+    """
+
+    def __init__(self, atag, intervals=None):
+        """Initiate scheduler with polling intervals per info bitmask."""
+        self._atag = atag
+        self.intervals = dict(POLL_INTERVALS if intervals is None else intervals)
+        self._due = {info: 0.0 for info in self.intervals}
+
+    def due(self, now=None):
+        """Return the combined info bitmask of all groups that are due."""
+        now = time.monotonic() if now is None else now
+        mask = 0
+        for info, due in self._due.items():
+            if due <= now:
+                mask |= info
+        return mask
+
+    async def poll(self):
+        """Retrieve the groups that are due and return the info bitmask used."""
+        now = time.monotonic()
+        mask = self.due(now)
+        if not mask:
+            return 0
+        await self._atag.update(mask)
+        for info in self._due:
+            if info & mask == info:
+                self._due[info] = now + self.intervals[info]
+        return mask
+
+    async def run(self):
+        """Poll until cancelled."""
+        while True:
+            try:
+                await self.poll()
+            except AtagException as err:
+                _LOGGER.warning("Polling %s failed: %s", self._atag.host, err)
+                await asyncio.sleep(min(self.intervals.values()))
+                continue
+            await asyncio.sleep(max(0, min(self._due.values()) - time.monotonic()))
+
+
+class AdaptivePoller:
+    """Poll an AtagOne faster while it is active and back off while idle.
+
+    The interval drops to min_interval while the boiler is burning or
+    heating, the modulation level or one of the extra fields moves, or a
+    control target awaits confirmation. Every other update multiplies the
+    interval by backoff, up to max_interval.
+    """
+
+    def __init__(
+        self,
+        atag,
+        min_interval=5,
+        max_interval=300,
+        backoff=2,
+        info=INFO_DEFAULT,
+        fields=(),
+    ):
+        """Initiate poller for an AtagOne object."""
+        self._atag = atag
+        self.fields = frozenset(ACTIVITY_FIELDS).union(fields)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.info = info
+        self.interval = min_interval
+        self._wake = asyncio.Event()
+
+    def wake(self):
+        """Poll again without waiting for the current interval to pass."""
+        self._wake.set()
+
+    def next_interval(self, report):
+        """Return the interval until the next poll given the latest report."""
+        if self._active(report):
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return self.interval
+
+    def _active(self, report):
+        """Return True if the report shows activity worth following closely."""
+        if "boiler_status" in report and report["boiler_status"].raw & 14:
+            return True  # burner, dhw or ch active
+        if any(obj.id in self.fields for obj in report.changed):
+            return True
+        return any(getattr(obj, "pending", False) for obj in report)
+
+    async def run(self):
+        """Poll until cancelled."""
+        while True:
+            self._wake.clear()
+            try:
+                await self._atag.update(self.info)
+                interval = self.next_interval(self._atag.report)
+            except AtagException as err:
+                _LOGGER.warning("Polling %s failed: %s", self._atag.host, err)
+                interval = self.interval = min(
+                    self.max_interval, self.interval * self.backoff
+                )
+            try:
+                await asyncio.wait_for(self._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,108 @@
+"""Local proxy sharing one AtagOne connection between many clients."""
+import time
+
+from aiohttp import web
+
+from . import errors
+from .codec import dumps, loads
+from .const import _LOGGER, DEFAULT_PORT, INFO_DEFAULT
+
+ACC_GRANTED = 2
+ACC_DENIED = 3
+
+
+class AtagProxy:
+    """Serve the device API locally on behalf of an AtagOne object.
+
+    Retrieve requests are answered from the latest device reply while it
+    is younger than max_age seconds, so any number of clients can read
+    while the device sees a single paced request stream. Update requests
+    go through AtagOne.setter, which serializes them and coalesces writes
+    within write_delay into one message; only control items are forwarded.
+    Pair requests are granted once the proxy itself is paired.
+    """
+
+    def __init__(self, atag, max_age=5, host="0.0.0.0", port=DEFAULT_PORT):
+        """Initiate proxy for an AtagOne object, listening on host and port."""
+        self._atag = atag
+        self.host = host
+        self.port = port
+        self.max_age = max_age
+        self._written = None
+        self._encoded = {}
+        self._runner = None
+
+    async def retrieve(self, info=INFO_DEFAULT):
+        """Return the encoded retrieve reply for info, from cache if fresh."""
+        max_age = self.max_age
+        if self._written is not None:
+            # replies older than the last write may still show old controls
+            max_age = min(max_age, time.monotonic() - self._written)
+        await self._atag.update(info, max_age)
+        reply = self._atag.replies[info]
+        cached = self._encoded.get(info)
+        if cached is None or cached[0] is not reply:
+            cached = self._encoded[info] = (reply, dumps({"retrieve_reply": reply}))
+        return cached[1]
+
+    async def update(self, controls):
+        """Write control items to the device and return the encoded reply."""
+        reply = await self._atag.setter(**controls)
+        self._written = time.monotonic()
+        return dumps({"update_reply": reply})
+
+    async def pair(self):
+        """Return the encoded pair reply, pairing the proxy if needed."""
+        try:
+            await self._atag.authorize()
+            status = ACC_GRANTED
+        except errors.Unauthorized:
+            status = ACC_DENIED
+        return dumps({"pair_reply": {"seqnr": 0, "acc_status": status}})
+
+    async def _handle(self, request):
+        """Answer a client request."""
+        path = request.match_info["path"]
+        try:
+            message = loads(await request.read())
+            if path == "retrieve":
+                body = await self.retrieve(
+                    message["retrieve_message"].get("info", INFO_DEFAULT)
+                )
+            elif path == "update":
+                body = await self.update(message["update_message"].get("control", {}))
+            elif path == "pair":
+                body = await self.pair()
+            else:
+                raise web.HTTPNotFound()
+        except (ValueError, KeyError, TypeError, AttributeError) as err:
+            raise web.HTTPBadRequest(text=f"Invalid {path} message") from err
+        except errors.ConnectionError as err:
+            raise web.HTTPServiceUnavailable(text=str(err)) from err
+        except errors.AtagException as err:
+            raise web.HTTPBadGateway(text=str(err)) from err
+        return web.Response(body=body, content_type="application/json")
+
+    async def start(self):
+        """Start serving the device API."""
+        app = web.Application()
+        app.router.add_post("/{path}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        _LOGGER.debug("Proxying %s on %s:%s", self._atag.host, self.host, self.port)
+        return self
+
+    async def stop(self):
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        """Start on entering the context."""
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        """Stop on exit."""
+        await self.stop()
@@ -0,0 +1,169 @@
+"""Append-only on-disk history of report changes."""
+import mmap
+import os
+import struct
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .codec import dumps, loads
+from .const import _LOGGER
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# one record per change: timestamp and value as little endian doubles
+RECORD = struct.Struct("<dd")
+SUFFIX = ".col"
+# one JSON line per change of fields with other than numeric values
+TEXT_SUFFIX = ".jsonl"
+
+
+class Recorder:
+    """Write changed report values to one column file per field.
+
+    Numeric values go to root/<device id>/<field>.col as fixed-size
+    (timestamp, value) records, so a reader can map them without parsing.
+    Other values, such as error strings, go to <field>.jsonl as
+    [timestamp, value] lines. Records are buffered and appended by a
+    background thread once flush_bytes are buffered or on flush().
+    """
+
+    def __init__(self, root, flush_bytes=1 << 16):
+        """Initiate recorder writing below root."""
+        self.root = root
+        self.flush_bytes = flush_bytes
+        self._buffers = {}
+        self._buffered = 0
+        self._writer = ThreadPoolExecutor(max_workers=1)  # keeps appends in order
+
+    def attach(self, atag):
+        """Record all changes of an AtagOne object, starting with its current state."""
+        return atag.subscribe(partial(self.record, atag), current=True)
+
+    def record(self, atag, changed, now=None):
+        """Buffer the values of changed report objects."""
+        now = time.time() if now is None else now
+        device = atag.id
+        for obj in changed:
+            raw = obj.raw
+            if isinstance(raw, (int, float)):
+                key = (device, obj.id + SUFFIX)
+                record = RECORD.pack(now, raw)
+            else:
+                key = (device, obj.id + TEXT_SUFFIX)
+                record = dumps([now, raw]) + b"\n"
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                buffer = self._buffers[key] = bytearray()
+            buffer += record
+            self._buffered += len(record)
+        if self._buffered >= self.flush_bytes:
+            self.flush()
+
+    def flush(self, wait=False):
+        """Append all buffered records to their files, optionally waiting."""
+        buffers, self._buffers = self._buffers, {}
+        self._buffered = 0
+        future = self._writer.submit(self._write, buffers)
+        future.add_done_callback(_log_error)
+        if wait:
+            future.result()
+
+    def _write(self, buffers):
+        """Append records to their files, in the writer thread."""
+        for (device, name), buffer in buffers.items():
+            path = os.path.join(self.root, device)
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, name), "ab") as file:
+                file.write(buffer)
+
+    def close(self):
+        """Write remaining records and stop the writer thread."""
+        self.flush()
+        self._writer.shutdown()
+
+
+def _log_error(future):
+    """Log a failed write of the writer thread."""
+    if future.exception() is not None:
+        _LOGGER.error("Writing records failed: %s", future.exception())
+
+
+class RecordReader:
+    """Read column files written by a Recorder through memory maps."""
+
+    def __init__(self, root):
+        """Initiate reader for files below root."""
+        self.root = root
+
+    def devices(self):
+        """Return the recorded device ids."""
+        return sorted(os.listdir(self.root))
+
+    def fields(self, device):
+        """Return the recorded fields of a device."""
+        return sorted(
+            {
+                os.path.splitext(name)[0]
+                for name in os.listdir(os.path.join(self.root, device))
+                if name.endswith((SUFFIX, TEXT_SUFFIX))
+            }
+        )
+
+    def read(self, device, field, start=None, end=None, previous=True):
+        """Return timestamps and values of a field between start and end.
+
+        As only changes are stored, previous also returns the last record
+        before start, which holds the value at start. Fields with other than
+        numeric values are returned as lists.
+        """
+        path = os.path.join(self.root, device, field + SUFFIX)
+        if not os.path.exists(path):
+            return self._read_text(path[: -len(SUFFIX)] + TEXT_SUFFIX, start, end, previous)
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            size -= size % RECORD.size  # ignore a partially written record
+            if not size:
+                return [], []
+            with mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+                return self._select(mapped, start, end, previous)
+
+    @staticmethod
+    def _read_text(path, start, end, previous):
+        """Return timestamps and values of a JSON lines file."""
+        with open(path, "rb") as file:
+            # ignore a partially written last line
+            records = [loads(line) for line in file if line.endswith(b"\n")]
+        times = [record[0] for record in records]
+        first = 0 if start is None else bisect_left(times, start)
+        last = len(times) if end is None else bisect_right(times, end)
+        first = max(0, first - 1) if previous and start is not None else first
+        return times[first:last], [record[1] for record in records[first:last]]
+
+    @staticmethod
+    def _select(mapped, start, end, previous):
+        """Select the records within a time range from a mapped file."""
+        if np is not None:
+            records = np.frombuffer(mapped, dtype="<f8").reshape(-1, 2)
+            times = records[:, 0]
+            first = 0 if start is None else int(np.searchsorted(times, start))
+            last = len(times) if end is None else int(
+                np.searchsorted(times, end, side="right")
+            )
+            first = max(0, first - 1) if previous and start is not None else first
+            result = records[first:last].copy()
+            del records, times
+            return result[:, 0], result[:, 1]
+        doubles = memoryview(mapped).cast("d")
+        times = doubles[0::2]
+        first = 0 if start is None else bisect_left(times, start)
+        last = len(times) if end is None else bisect_right(times, end)
+        first = max(0, first - 1) if previous and start is not None else first
+        result = (times[first:last].tolist(), doubles[1::2][first:last].tolist())
+        times.release()
+        doubles.release()
+        return result
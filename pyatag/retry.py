@@ -0,0 +1,122 @@
+"""Retry and circuit breaker policies for ATAG One requests."""
+import asyncio
+import random
+import time
+
+import aiohttp
+
+from . import errors
+from .const import _LOGGER
+
+
+class RetryPolicy:
+    """Retry failed requests with exponential backoff and jitter.
+
+    Server disconnects are common and retried up to attempts times, other
+    connection errors only up to error_attempts times. Timeouts are only
+    retried with timeouts=True, as each attempt on a dead device would
+    otherwise wait for the full timeout.
+    """
+
+    def __init__(
+        self,
+        attempts=10,
+        error_attempts=3,
+        base=0.1,
+        cap=5.0,
+        jitter=0.5,
+        retry_on=(aiohttp.ClientConnectionError, asyncio.TimeoutError),
+        timeouts=False,
+    ):
+        """Initiate policy, delays in seconds."""
+        self.attempts = attempts
+        self.error_attempts = error_attempts
+        self.base = base
+        self.cap = cap
+        self.jitter = jitter
+        self.retry_on = retry_on
+        self.timeouts = timeouts
+
+    def retry(self, err, attempt):
+        """Return True if the failed attempt (counting from 0) should be retried."""
+        if isinstance(err, asyncio.TimeoutError) and not self.timeouts:
+            return False
+        if isinstance(err, aiohttp.ServerDisconnectedError):
+            return attempt + 1 < self.attempts
+        return attempt + 1 < self.error_attempts and isinstance(err, self.retry_on)
+
+    def delay(self, attempt):
+        """Return the backoff delay before the next attempt."""
+        delay = min(self.cap, self.base * 2 ** attempt)
+        return delay * (1 - self.jitter * random.random())
+
+
+class CircuitBreaker:
+    """Fail fast while a device is known to be down.
+
+    The circuit opens after threshold consecutive failures. While open,
+    calls raise CircuitOpen without contacting the device, and the probe
+    coroutine function (if given) is retried in the background with
+    growing delays until it succeeds and closes the circuit.
+    """
+
+    def __init__(
+        self, threshold=3, reset_timeout=30, max_reset_timeout=300, probe=None
+    ):
+        """Initiate closed circuit."""
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.probe = probe
+        self.failures = 0
+        self._opened = None
+        self._probe_task = None
+
+    @property
+    def closed(self):
+        """Return True if calls are allowed."""
+        return self._opened is None
+
+    def check(self):
+        """Raise CircuitOpen if calls should fail fast."""
+        if self._opened is None:
+            return
+        if self.probe is None and time.monotonic() - self._opened > self.reset_timeout:
+            self._opened = time.monotonic()  # let this call through as a probe
+            return
+        raise errors.CircuitOpen("Device unreachable, failing fast")
+
+    def success(self):
+        """Close the circuit after a successful call."""
+        self.failures = 0
+        self._opened = None
+
+    def failure(self):
+        """Record a failed call, opening the circuit at the threshold."""
+        self.failures += 1
+        if self.failures < self.threshold:
+            return
+        self._opened = time.monotonic()
+        if self.probe is not None and (
+            self._probe_task is None or self._probe_task.done()
+        ):
+            self._probe_task = asyncio.ensure_future(self._run_probe())
+
+    def close(self):
+        """Stop probing in the background."""
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+
+    async def _run_probe(self):
+        """Probe the device in the background until it answers."""
+        delay = self.reset_timeout
+        while self._opened is not None:
+            await asyncio.sleep(delay)
+            try:
+                await self.probe()
+            except errors.AtagException as err:
+                _LOGGER.debug("Probe failed: %s", err)
+                delay = min(self.max_reset_timeout, delay * 2)
+                continue
+            self.success()
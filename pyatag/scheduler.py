@@ -0,0 +1,109 @@
+"""Priority scheduling of requests to a single ATAG One device."""
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class RequestScheduler:
+    """Run device requests one at a time, lowest priority value first.
+
+    Requests with equal priority run in order of arrival. Requests that
+    pass the same key while an earlier one is still queued share its result
+    instead of sending a duplicate request. When that earlier request is
+    cancelled, the requests merged into it are queued again themselves.
+    """
+
+    def __init__(self):
+        """Initiate empty scheduler."""
+        self._queue = []
+        self._queued = {}
+        self._seq = itertools.count()
+        self._busy = False
+        self.served = 0
+        self.merged = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def depth(self):
+        """Return the number of requests waiting for their turn."""
+        return sum(not turn.done() for _, _, turn in self._queue)
+
+    @property
+    def stats(self):
+        """Return queue depth and wait time statistics."""
+        return {
+            "depth": self.depth,
+            "served": self.served,
+            "merged": self.merged,
+            "mean_wait": self.total_wait / self.served if self.served else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+    async def run(self, priority, func, key=None):
+        """Await func() once it is this request's turn and return its result."""
+        if key is not None and key in self._queued:
+            self.merged += 1
+            shared = self._queued[key]
+            try:
+                return await asyncio.shield(shared)
+            except asyncio.CancelledError:
+                if not shared.cancelled():
+                    raise  # this request was cancelled
+            return await self.run(priority, func, key)
+        loop = asyncio.get_running_loop()
+        result = loop.create_future()
+        result.add_done_callback(_consume)
+        if key is not None:
+            self._queued[key] = result
+        enqueued = time.monotonic()
+        if self._busy:
+            turn = loop.create_future()
+            heapq.heappush(self._queue, (priority, next(self._seq), turn))
+            try:
+                await turn
+            except asyncio.CancelledError:
+                if turn.done() and not turn.cancelled():
+                    self._release()  # turn was granted, pass it on
+                self._unqueue(key, result)
+                result.cancel()
+                raise
+        self._busy = True
+        self._unqueue(key, result)
+        wait = time.monotonic() - enqueued
+        self.served += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        try:
+            value = await func()
+        except asyncio.CancelledError:
+            result.cancel()
+            raise
+        except Exception as err:
+            result.set_exception(err)
+            raise
+        finally:
+            self._release()
+        result.set_result(value)
+        return value
+
+    def _unqueue(self, key, result):
+        """Stop merging new requests into this one."""
+        if key is not None and self._queued.get(key) is result:
+            del self._queued[key]
+
+    def _release(self):
+        """Hand the turn to the next waiting request."""
+        while self._queue:
+            _, _, turn = heapq.heappop(self._queue)
+            if not turn.done():
+                turn.set_result(None)
+                return
+        self._busy = False
+
+
+def _consume(future):
+    """Mark a shared result as retrieved when nobody merged into it."""
+    if not future.cancelled():
+        future.exception()
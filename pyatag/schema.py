@@ -0,0 +1,83 @@
+"""Precompiled decoding rules for ATAG report fields."""
+from datetime import datetime, timedelta
+from functools import partial
+
+from .const import CLASSES, FIELD_CLASSES, SENSORS, STATES
+
+EPOCH = datetime(2000, 1, 1)
+# fields whose raw value holds flags, by flag name
+BIT_FIELDS = {"boiler_status": {"burner": 8, "dhw": 4, "ch": 2}}
+
+
+def convert_time(seconds, sensorclass="time"):
+    """Convert reported time to real time."""
+    if sensorclass == "duration":
+        return str(timedelta(seconds=seconds))
+    return str(EPOCH + timedelta(seconds=seconds))
+
+
+def _decode_boiler_status(raw):
+    """Split boiler status bits."""
+    return {name: raw & bit == bit for name, bit in BIT_FIELDS["boiler_status"].items()}
+
+
+CLASS_DECODERS = {
+    "time": convert_time,
+    "duration": partial(convert_time, sensorclass="duration"),
+}
+DECODERS = {
+    "boiler_status": _decode_boiler_status,
+    "download_url": lambda raw: raw.split("/")[-1],
+    "dhw_mode_temp": lambda raw: raw % 150,
+}
+
+
+class Field:
+    """Decoding rules for a single report field."""
+
+    __slots__ = (
+        "id",
+        "key",
+        "sensorclass",
+        "unit",
+        "icon",
+        "icons",
+        "states",
+        "decode",
+        "lookup",
+        "codes",
+    )
+
+    def __init__(self, _id):
+        """Compile the rules for a field id from the constants."""
+        self.id = _id
+        self.key = SENSORS.get(_id) or _id
+        info = CLASSES.get(FIELD_CLASSES.get(_id) or _id.split("_")[-1])
+        self.sensorclass, self.unit, self.icon = info or (None, None, None)
+        self.states = states = STATES.get(_id)
+        self.icons = self.lookup = self.codes = None
+        self.decode = CLASS_DECODERS.get(self.sensorclass) or DECODERS.get(_id)
+        if states is not None and self.decode is None:
+            if isinstance(next(iter(states.values())), dict):
+                self.icons = {raw: val["icon"] for raw, val in states.items()}
+                states = {raw: val["state"] for raw, val in states.items()}
+            self.decode = states.get
+            # reverse tables to validate and encode user supplied states
+            self.codes = {val: raw for raw, val in states.items()}
+            self.lookup = {val.lower(): val for val in self.codes}
+
+
+FIELDS = {_id: Field(_id) for _id in {*SENSORS, *STATES, *FIELD_CLASSES, *DECODERS}}
+
+
+def field_key(_id):
+    """Return the report key for a field id or name, without compiling it."""
+    return SENSORS.get(_id) or _id
+
+
+def get_field(_id):
+    """Return the rules for a field id, compiling unknown fields once."""
+    field = FIELDS.get(_id)
+    if field is None:
+        field = FIELDS[_id] = Field(_id)
+    return field
@@ -0,0 +1,331 @@
+"""Run a fleet of ATAG One devices sharded across worker processes.
+
+Workers are started with python -m pyatag.sharding and exchange one JSON
+array per line with the parent over their stdin and stdout.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+from functools import partial
+
+from . import errors
+from .codec import dumps, loads
+from .const import _LOGGER, DEFAULT_PORT, INFO_DEFAULT
+from .fleet import AtagFleet
+
+# minimum lifetime in seconds of a worker before it is replaced immediately
+RESPAWN_DELAY = 1.0
+# directory containing the package, for workers of an uninstalled checkout
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Worker:
+    """Parent side of one worker process."""
+
+    def __init__(self, process):
+        """Initiate worker for a started process."""
+        self.process = process
+        self.keys = set()
+        self.requests = set()
+        self.task = None
+        self.started = time.monotonic()
+        self.ready = asyncio.get_running_loop().create_future()
+
+    def send(self, *message):
+        """Send a message to the worker process."""
+        self.process.stdin.write(dumps(message) + b"\n")
+
+
+class ShardedFleet:
+    """Poll many devices from a pool of worker processes.
+
+    Each worker runs an AtagFleet in its own event loop, so JSON decoding
+    and report processing use all cores. Devices are assigned to the least
+    loaded worker. When a worker dies it is replaced and its devices are
+    assigned again. Workers send the changed raw values of every poll
+    cycle, which are merged into state and passed to subscribers as
+    callback(key, changes).
+    """
+
+    def __init__(
+        self,
+        workers=None,
+        interval=30,
+        info=INFO_DEFAULT,
+        concurrency=100,
+        transport="aiohttp",
+    ):
+        """Initiate runner with a number of workers, one per core by default."""
+        self.size = workers or os.cpu_count() or 1
+        self.interval = interval
+        self.info = info
+        self.concurrency = concurrency
+        self.transport = transport
+        self.workers = []
+        self.state = {}
+        self.updated = {}
+        self.errors = {}
+        self._devices = {}
+        self._listeners = []
+        self._replies = {}
+        self._ids = itertools.count()
+        self._running = False
+
+    def add(self, host, device=None, port=DEFAULT_PORT, key=None, **kwargs):
+        """Register a device and return its key.
+
+        Extra keyword arguments are passed to AtagOne in the worker and
+        must be JSON serializable.
+        """
+        key = key or f"{host}:{port}"
+        if key not in self._devices:
+            self._devices[key] = [host, port, device, kwargs]
+            if self._running:
+                self._assign(key)
+        return key
+
+    def remove(self, key):
+        """Unregister a device."""
+        del self._devices[key]
+        for worker in self.workers:
+            if key in worker.keys:
+                worker.keys.discard(key)
+                worker.send("remove", key)
+        self.state.pop(key, None)
+        self.updated.pop(key, None)
+        self.errors.pop(key, None)
+
+    def _assign(self, key):
+        """Send a device to the least loaded worker."""
+        worker = min(self.workers, key=lambda worker: len(worker.keys))
+        worker.keys.add(key)
+        worker.send("add", key, *self._devices[key])
+
+    def subscribe(self, callback):
+        """Call callback(key, changes) with changed raw values of each device."""
+        self._listeners.append(callback)
+        return partial(self._listeners.remove, callback)
+
+    async def start(self):
+        """Start the worker processes and assign all devices once they run."""
+        self._running = True
+        for _ in range(self.size):
+            await self._spawn()
+        await asyncio.gather(*(worker.ready for worker in self.workers))
+        for key in self._devices:
+            self._assign(key)
+        return self
+
+    async def _spawn(self):
+        """Start a worker process."""
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            __name__,
+            f"--interval={self.interval}",
+            f"--info={self.info}",
+            f"--concurrency={self.concurrency}",
+            f"--transport={self.transport}",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=1 << 24,
+            env={
+                **os.environ,
+                "PYTHONPATH": os.pathsep.join(
+                    filter(None, [PACKAGE_ROOT, os.environ.get("PYTHONPATH")])
+                ),
+            },
+        )
+        worker = Worker(process)
+        worker.task = asyncio.ensure_future(self._read(worker))
+        self.workers.append(worker)
+        return worker
+
+    async def _read(self, worker):
+        """Process messages of a worker until it exits."""
+        stdout = worker.process.stdout
+        while True:
+            line = await stdout.readline()
+            if not line:
+                break
+            message = loads(line)
+            if message[0] == "poll":
+                self._merge(*message[1:])
+            elif message[0] == "ready":
+                worker.ready.set_result(True)
+            elif message[0] == "reply":
+                _, request, result, error = message
+                worker.requests.discard(request)
+                future = self._replies.pop(request, None)
+                if future is not None and not future.done():
+                    if error is None:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(errors.RequestError(error))
+        if not worker.ready.done():
+            worker.ready.set_result(False)
+        code = await worker.process.wait()
+        if self._running:
+            _LOGGER.warning("Worker %s exited with %s", worker.process.pid, code)
+            await self._replace(worker)
+
+    async def _replace(self, worker):
+        """Replace a dead worker and assign its devices again."""
+        self.workers.remove(worker)
+        for request in worker.requests:
+            future = self._replies.pop(request, None)
+            if future is not None and not future.done():
+                future.set_exception(errors.ConnectionError("Worker exited"))
+        await asyncio.sleep(RESPAWN_DELAY - (time.monotonic() - worker.started))
+        if not self._running:
+            return
+        await self._spawn()
+        for key in worker.keys:
+            if key in self._devices:
+                self._assign(key)
+
+    def _merge(self, now, results):
+        """Merge the results of a poll cycle into the aggregated state."""
+        for key, error, changes in results:
+            if key not in self._devices:
+                continue
+            self.errors[key] = error
+            if error is None:
+                self.updated[key] = now
+            if changes:
+                self.state.setdefault(key, {}).update(changes)
+                for callback in self._listeners:
+                    try:
+                        callback(key, changes)
+                    except Exception:  # a broken subscriber must not stop merging
+                        _LOGGER.exception("Error in change callback %s", callback)
+
+    async def setter(self, key, **controls):
+        """Write control items to a device and return its update_reply."""
+        worker = next((worker for worker in self.workers if key in worker.keys), None)
+        if worker is None:
+            raise KeyError(key)
+        request = next(self._ids)
+        future = self._replies[request] = asyncio.get_running_loop().create_future()
+        worker.requests.add(request)
+        worker.send("set", request, key, controls)
+        return await future
+
+    async def stop(self):
+        """Stop all worker processes."""
+        self._running = False
+        for worker in self.workers:
+            worker.process.stdin.close()
+        for worker in self.workers:
+            await worker.task
+        self.workers = []
+        for future in self._replies.values():
+            future.cancel()
+        self._replies.clear()
+
+    async def __aenter__(self):
+        """Start on entering the context."""
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        """Stop on exit."""
+        await self.stop()
+
+
+class _WorkerLoop:
+    """Worker side: poll an AtagFleet and report changes to the parent."""
+
+    def __init__(self, args):
+        """Initiate worker from its command line arguments."""
+        self.args = args
+        self.fleet = AtagFleet(concurrency=args.concurrency, transport=args.transport)
+        self._changes = {}
+        self._unsubscribe = {}
+
+    def _send(self, *message):
+        """Write a message to the parent."""
+        sys.stdout.buffer.write(dumps(message) + b"\n")
+        sys.stdout.buffer.flush()
+
+    def _collect(self, key, changed):
+        """Collect changed raw values of a device."""
+        changes = self._changes.setdefault(key, {})
+        for obj in changed:
+            changes[obj.id] = obj.raw
+
+    async def _handle(self, message):
+        """Apply a message from the parent."""
+        if message[0] == "add":
+            _, key, host, port, device, kwargs = message
+            atag = self.fleet.add(host, device, port, key, **kwargs)
+            self._unsubscribe[key] = atag.subscribe(partial(self._collect, key))
+        elif message[0] == "remove":
+            self._unsubscribe.pop(message[1])()
+            await self.fleet.remove(message[1])
+        elif message[0] == "set":
+            _, request, key, controls = message
+            try:
+                reply = await self.fleet[key].setter(**controls)
+                self._send("reply", request, reply, None)
+            except (errors.AtagException, KeyError) as err:
+                self._send("reply", request, None, f"{type(err).__name__}: {err}")
+
+    async def _commands(self):
+        """Read messages from the parent until stdin closes."""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=1 << 24)
+        await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), sys.stdin
+        )
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            message = loads(line)
+            if message[0] == "set":
+                asyncio.ensure_future(self._handle(message))
+            else:
+                await self._handle(message)
+
+    async def _poll(self):
+        """Update all devices every interval and send the results."""
+        while True:
+            start = time.monotonic()
+            if len(self.fleet):
+                results = await self.fleet.update_all(self.args.info)
+                out = []
+                for key, result in results.items():
+                    changes = self._changes.pop(key, None)
+                    if key not in self._unsubscribe:
+                        continue  # removed during the update
+                    error = None if result.success else repr(result.error)
+                    out.append([key, error, changes])
+                self._send("poll", time.time(), out)
+            await asyncio.sleep(max(0, self.args.interval - (time.monotonic() - start)))
+
+    async def run(self):
+        """Poll until the parent closes stdin."""
+        poll = asyncio.ensure_future(self._poll())
+        self._send("ready")
+        try:
+            await self._commands()
+        finally:
+            poll.cancel()
+            await self.fleet.close()
+
+
+def main():
+    """Run a worker process of a ShardedFleet."""
+    parser = argparse.ArgumentParser(description="ShardedFleet worker")
+    parser.add_argument("--interval", type=float, default=30)
+    parser.add_argument("--info", type=int, default=INFO_DEFAULT)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--transport", default="aiohttp")
+    asyncio.run(_WorkerLoop(parser.parse_args()).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""Simulated ATAG One devices for local testing and benchmarks.
+
+Run a farm from the command line with python -m pyatag.simulator.
+"""
+import argparse
+import asyncio
+import copy
+import random
+import socket
+import time
+
+from aiohttp import web
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+from .const import (
+    _LOGGER,
+    DEFAULT_PORT,
+    INFO_CONFIGURATION,
+    INFO_CONTROL,
+    INFO_DETAILS,
+)
+from .discovery import ATAG_UDP_PORT
+
+ACC_GRANTED = 2
+ACC_DENIED = 3
+# open file limit to aim for when the hard limit is unlimited
+MAX_FILES = 65536
+
+REPLY = {
+    "seqnr": 0,
+    "status": {
+        "device_id": None,
+        "device_status": 16385,
+        "connection_status": 23,
+        "date_time": 0,
+    },
+    "report": {
+        "report_time": 0,
+        "burning_hours": 2500.5,
+        "device_errors": "",
+        "boiler_errors": "",
+        "room_temp": 20.5,
+        "outside_temp": 8.2,
+        "dbg_outside_temp": 8.2,
+        "pcb_temp": 25.1,
+        "ch_setpoint": 35.0,
+        "dhw_water_temp": 40.0,
+        "ch_water_temp": 38.0,
+        "dhw_water_pres": 0.0,
+        "ch_water_pres": 1.6,
+        "ch_return_temp": 33.0,
+        "boiler_status": 0,
+        "boiler_config": 772,
+        "ch_time_to_temp": 0,
+        "shown_set_temp": 20.0,
+        "power_cons": 0,
+        "tout_avg": 7.9,
+        "rssi": 30,
+        "current": 40,
+        "voltage": 3820,
+        "charge_status": 0,
+        "lmuc_burner_starts": 1000,
+        "dhw_flow_rate": 0.0,
+        "resets": 5,
+        "memory_allocation": 10000,
+    },
+    "details": {
+        "boiler_temp": 38.0,
+        "boiler_return_temp": 33.0,
+        "min_mod_level": 20,
+        "rel_mod_level": 0,
+        "boiler_capacity": 24,
+        "target_temp": 35.0,
+        "overshoot": 0.0,
+        "max_boiler_temp": 80.0,
+        "alpha_used": 0.1,
+        "regulation_state": 1,
+        "lmuc_burner_hours": 2500,
+        "lmuc_dhw_hours": 200,
+    },
+    "control": {
+        "ch_status": 13,
+        "ch_control_mode": 0,
+        "ch_mode": 2,
+        "ch_mode_duration": 0,
+        "ch_mode_temp": 20.0,
+        "dhw_temp_setp": 50.0,
+        "dhw_status": 5,
+        "dhw_mode": 1,
+        "dhw_mode_temp": 150,
+        "weather_temp": 8.2,
+        "weather_status": 8,
+        "vacation_duration": 0,
+        "extend_duration": 0,
+        "fireplace_duration": 10800,
+    },
+    "configuration": {
+        "download_url": "http://firmware.atag-one.com:80/R58",
+        "temp_unit": 0,
+        "dhw_max_set": 65,
+        "dhw_min_set": 40,
+    },
+}
+
+
+class SimulatedDevice:
+    """State of one simulated thermostat.
+
+    Room temperature drifts toward the setpoint while the burner runs,
+    which switches on and off around the setpoint.
+    """
+
+    def __init__(self, device_id, latency=0.0, disconnect_rate=0.0, deny_rate=0.0):
+        """Initiate device with fault injection settings."""
+        self.device_id = device_id
+        self.latency = latency
+        self.disconnect_rate = disconnect_rate
+        self.deny_rate = deny_rate
+        self.requests = 0
+        self.updates = []
+        self._random = random.Random(device_id)
+        self._data = copy.deepcopy(REPLY)
+        self._data["status"]["device_id"] = device_id
+        self._data["report"]["room_temp"] = round(self._random.uniform(17, 22), 1)
+
+    def _step(self):
+        """Advance the simulated heating process."""
+        now = int(time.time()) - 946684800  # seconds since 2000-01-01
+        report, control = self._data["report"], self._data["control"]
+        self._data["status"]["date_time"] = report["report_time"] = now
+        burning = report["room_temp"] < control["ch_mode_temp"]
+        report["boiler_status"] = 10 if burning else 0
+        self._data["details"]["rel_mod_level"] = self._random.randint(20, 80) * burning
+        drift = 0.1 if burning else -0.05
+        report["room_temp"] = round(
+            report["room_temp"] + drift + self._random.uniform(-0.05, 0.05), 1
+        )
+
+    def retrieve_reply(self, info):
+        """Return a retrieve reply for the groups requested in info."""
+        self._step()
+        data = self._data
+        report = dict(data["report"])
+        if info & INFO_DETAILS:
+            report["details"] = dict(data["details"])
+        reply = {"seqnr": 0, "status": dict(data["status"]), "report": report}
+        if info & INFO_CONTROL:
+            reply["control"] = dict(data["control"])
+        if info & INFO_CONFIGURATION:
+            reply["configuration"] = dict(data["configuration"])
+        reply["acc_status"] = self.acc_status()
+        return {"retrieve_reply": reply}
+
+    def update_reply(self, message):
+        """Apply an update message and return the reply."""
+        self.updates.append(message)
+        self._data["control"].update(message.get("control", {}))
+        return {"update_reply": {"seqnr": 0, "acc_status": self.acc_status()}}
+
+    def pair_reply(self):
+        """Return a pair reply."""
+        return {"pair_reply": {"seqnr": 0, "acc_status": self.acc_status()}}
+
+    def delay(self):
+        """Return a random response delay around the configured latency."""
+        return self._random.expovariate(1 / self.latency) if self.latency else 0
+
+    def drops(self):
+        """Return True if this request should be disconnected."""
+        return self._random.random() < self.disconnect_rate
+
+    def acc_status(self):
+        """Return the account status, randomly denied at deny_rate."""
+        return ACC_DENIED if self._random.random() < self.deny_rate else ACC_GRANTED
+
+    def broadcast(self):
+        """Return the discovery broadcast of this device."""
+        return f"ONE {self.device_id} (ST)".encode()
+
+
+class DeviceFarm:
+    """Serve many simulated devices, one loopback port each."""
+
+    def __init__(
+        self,
+        count,
+        base_port=DEFAULT_PORT,
+        host="127.0.0.1",
+        latency=0.0,
+        disconnect_rate=0.0,
+        deny_rate=0.0,
+    ):
+        """Initiate farm of count devices on consecutive ports."""
+        self.host = host
+        self.devices = {}
+        for i in range(count):
+            self.devices[base_port + i] = SimulatedDevice(
+                f"{i:04d}-0000-0000_00-00-000-{i % 1000:03d}",
+                latency,
+                disconnect_rate,
+                deny_rate,
+            )
+        self._runner = None
+
+    async def start(self):
+        """Start serving all devices."""
+        app = web.Application()
+        app.router.add_post("/{path}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        for port in self.devices:
+            await web.TCPSite(self._runner, self.host, port).start()
+        _LOGGER.debug("Serving %s simulated devices", len(self.devices))
+        return self
+
+    async def stop(self):
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request):
+        """Answer a request for the device listening on the local port."""
+        device = self.devices[request.transport.get_extra_info("sockname")[1]]
+        device.requests += 1
+        message = await request.json()
+        await asyncio.sleep(device.delay())
+        if device.drops():
+            request.transport.close()
+            raise web.HTTPServiceUnavailable()
+        path = request.match_info["path"]
+        if path == "retrieve":
+            reply = device.retrieve_reply(message["retrieve_message"]["info"])
+        elif path == "update":
+            reply = device.update_reply(message["update_message"])
+        elif path == "pair":
+            reply = device.pair_reply()
+        else:
+            raise web.HTTPNotFound()
+        return web.json_response(reply)
+
+    def broadcast(self, port=ATAG_UDP_PORT, target="127.0.0.1"):
+        """Send the discovery broadcast of every device once."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        try:
+            for device in self.devices.values():
+                sock.sendto(device.broadcast(), (target, port))
+        finally:
+            sock.close()
+
+    async def __aenter__(self):
+        """Start serving on entering the context."""
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        """Stop serving on exit."""
+        await self.stop()
+
+
+def raise_file_limit():
+    """Raise the open file limit as far as allowed, for large farms."""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = MAX_FILES if hard == resource.RLIM_INFINITY else hard
+    if soft == resource.RLIM_INFINITY or soft >= target:
+        return
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    except (ValueError, OSError) as err:
+        _LOGGER.debug("Cannot raise open file limit to %s: %s", target, err)
+
+
+async def _serve(args):
+    """Serve a farm until cancelled."""
+    farm = DeviceFarm(
+        args.devices,
+        args.port,
+        args.host,
+        args.latency,
+        args.disconnect_rate,
+        args.deny_rate,
+    )
+    async with farm:
+        print("ready", flush=True)
+        while True:
+            if args.broadcast:
+                farm.broadcast()
+            await asyncio.sleep(args.broadcast or 3600)
+
+
+def main():
+    """Run a simulated device farm."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--disconnect-rate", type=float, default=0.0)
+    parser.add_argument("--deny-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--broadcast", type=float, default=0.0, help="discovery interval (s)"
+    )
+    args = parser.parse_args()
+    raise_file_limit()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Capture device traffic to trace files and replay it offline."""
+import asyncio
+import gzip
+import itertools
+import time
+
+import aiohttp
+
+from . import errors
+from .codec import dumps, loads
+from .const import _LOGGER
+from .gateway import AtagOne
+from .pacing import Pacer
+
+# recorded error names mapped back to the exceptions raised on replay
+ERRORS = {
+    "ServerDisconnectedError": aiohttp.ServerDisconnectedError,
+    "ClientConnectionError": aiohttp.ClientConnectionError,
+    "TimeoutError": asyncio.TimeoutError,
+}
+
+
+def _open(path, mode):
+    """Open a trace file, gzip compressed if the name ends with .gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _text(body):
+    """Return a request or reply body as text."""
+    if body is None or isinstance(body, str):
+        return body
+    return body.decode(errors="replace")
+
+
+class TraceRecord:
+    """One request attempt and its outcome."""
+
+    __slots__ = (
+        "time",
+        "host",
+        "port",
+        "path",
+        "attempt",
+        "latency",
+        "body",
+        "reply",
+        "error",
+    )
+
+    def __init__(self, time, host, port, path, attempt, latency, body, reply, error):
+        """Initiate record from the fields of a trace line."""
+        self.time = time
+        self.host = host
+        self.port = port
+        self.path = path
+        self.attempt = attempt
+        self.latency = latency
+        self.body = body
+        self.reply = reply
+        self.error = error
+
+    def __repr__(self):
+        """Return readable record."""
+        outcome = self.error or f"{len(self.reply or '')} bytes"
+        return f"{self.host}:{self.port} {self.path}: {outcome} ({self.latency:.3f}s)"
+
+
+class TraceWriter:
+    """Append request attempts to a trace file.
+
+    Each line is a JSON array with the wall time, host, port, path, attempt
+    number, latency, request body, reply body and error name. Files ending
+    in .gz are gzip compressed. Pass the writer as trace to AtagOne.
+    """
+
+    def __init__(self, path):
+        """Open the trace file for appending."""
+        self.path = path
+        self._file = _open(path, "ab")
+
+    def record(self, host, port, path, attempt, body, reply, latency, error=None):
+        """Write one request attempt."""
+        self._file.write(
+            dumps(
+                [
+                    time.time() - latency,
+                    host,
+                    port,
+                    path,
+                    attempt,
+                    latency,
+                    _text(body),
+                    _text(reply),
+                    None if error is None else type(error).__name__,
+                ]
+            )
+            + b"\n"
+        )
+
+    def close(self):
+        """Close the trace file."""
+        self._file.close()
+
+    def __enter__(self):
+        """Enter context."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the trace file on exit."""
+        self.close()
+
+
+def read_trace(path):
+    """Return the records of a trace file."""
+    with _open(path, "rb") as file:
+        return [TraceRecord(*loads(line)) for line in file if line.strip()]
+
+
+class ReplayTransport:
+    """Answer requests with the replies recorded for one device.
+
+    Replies are returned in recorded order per path, starting over at the
+    end, after the recorded latency divided by speed. Recorded errors are
+    raised again. A speed of None skips all delays.
+    """
+
+    def __init__(self, records, speed=1.0):
+        """Initiate transport from the records of one device."""
+        self.speed = speed
+        replies = {}
+        for record in records:
+            reply = None if record.reply is None else record.reply.encode()
+            replies.setdefault(record.path, []).append(
+                (record.latency, reply, record.error)
+            )
+        self._replies = {path: itertools.cycle(seq) for path, seq in replies.items()}
+
+    async def post(self, path, body):
+        """Return the next recorded reply for path."""
+        replies = self._replies.get(path)
+        if replies is None:
+            raise aiohttp.ClientConnectionError(f"No recorded {path} replies")
+        latency, reply, error = next(replies)
+        if self.speed:
+            await asyncio.sleep(latency / self.speed)
+        if error is not None:
+            raise ERRORS.get(error, aiohttp.ClientConnectionError)(f"Replayed {error}")
+        return reply
+
+    async def close(self):
+        """Nothing to close."""
+
+
+class Replay:
+    """Replay a trace through AtagOne objects for many virtual devices.
+
+    Virtual devices take the recorded devices in turn. Each one repeats the
+    retrieve and update calls of its device at the recorded intervals
+    divided by speed, through the regular request scheduling, decoding and
+    report processing. Extra keyword arguments are passed to AtagOne.
+    """
+
+    def __init__(self, records, devices=None, speed=1.0, repeat=1, **kwargs):
+        """Create the virtual devices."""
+        self.speed = speed
+        self.repeat = repeat
+        self.calls = 0
+        self.failures = 0
+        recorded = {}
+        for record in sorted(records, key=lambda record: record.time):
+            recorded.setdefault((record.host, record.port), []).append(record)
+        count = len(recorded) if devices is None else devices
+        self.devices = []
+        for i, records in zip(range(count), itertools.cycle(recorded.values())):
+            atag = AtagOne(
+                f"replay-{i}",
+                device=f"replay-{i}",
+                transport=ReplayTransport(records, speed),
+                **{"pacer": Pacer(), **kwargs},
+            )
+            self.devices.append((atag, records))
+
+    async def run(self):
+        """Replay all devices concurrently and return the elapsed time."""
+        start = time.monotonic()
+        await asyncio.gather(
+            *(self._drive(atag, records, start) for atag, records in self.devices)
+        )
+        elapsed = time.monotonic() - start
+        _LOGGER.debug(
+            "Replayed %s calls in %.3fs, %s failed", self.calls, elapsed, self.failures
+        )
+        return elapsed
+
+    async def _drive(self, atag, records, start):
+        """Repeat the recorded calls of one device."""
+        first = records[0].time
+        duration = records[-1].time - first
+        for rnd in range(self.repeat):
+            for record in records:
+                if record.attempt or record.path not in ("retrieve", "update"):
+                    continue  # retries and pairing follow from the replies
+                if self.speed:
+                    offset = (record.time - first + rnd * duration) / self.speed
+                    delay = offset - (time.monotonic() - start)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                self.calls += 1
+                try:
+                    message = loads(record.body)
+                    if record.path == "retrieve":
+                        await atag.update(message["retrieve_message"]["info"], 0)
+                    else:
+                        await atag.setter(**message["update_message"]["control"])
+                except errors.AtagException:
+                    self.failures += 1
+
+    async def close(self):
+        """Close all virtual devices."""
+        await asyncio.gather(*(atag.close() for atag, _ in self.devices))
+
+    async def __aenter__(self):
+        """Enter async context."""
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Close virtual devices on exit."""
+        await self.close()
@@ -0,0 +1,143 @@
+"""Transports carrying requests to ATAG One devices."""
+import asyncio
+
+import aiohttp
+
+
+class AiohttpTransport:
+    """Send requests through an aiohttp ClientSession."""
+
+    def __init__(self, host, port, headers, session=None):
+        """Initiate transport, creating a session if none is given."""
+        self._base = f"http://{host}:{port}/"
+        self._headers = headers
+        self._own_session = session is None
+        self.session = session or aiohttp.ClientSession()
+
+    async def post(self, path, body):
+        """Post body to path and return the reply body."""
+        async with self.session.post(
+            self._base + path, headers=self._headers, data=body
+        ) as res:
+            return await res.read()
+
+    async def close(self):
+        """Close the session if owned by the transport."""
+        if self._own_session:
+            await self.session.close()
+
+
+class StreamTransport:
+    """Keep one persistent HTTP/1.1 connection per device on asyncio streams.
+
+    The device often drops idle connections. A request that fails on a
+    reused connection is retried once on a fresh one before the failure
+    is reported as a server disconnect.
+    """
+
+    def __init__(self, host, port, headers, timeout=10):
+        """Initiate transport without connecting."""
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._head = "".join(
+            f"{name}: {value}\r\n"
+            for name, value in {
+                "Host": f"{host}:{port}",
+                **headers,
+                "Connection": "keep-alive",
+            }.items()
+        )
+        self._prefixes = {}
+        self._reader = self._writer = None
+
+    async def post(self, path, body):
+        """Post body to path and return the reply body."""
+        body = body or b""
+        prefix = self._prefixes.get(path)
+        if prefix is None:
+            prefix = self._prefixes[path] = (
+                f"POST /{path} HTTP/1.1\r\n{self._head}Content-Length: "
+            ).encode()
+        message = b"%s%d\r\n\r\n%s" % (prefix, len(body), body)
+        while True:
+            fresh = self._writer is None
+            if fresh:
+                await self._connect()
+            completed = False
+            try:
+                reply = await asyncio.wait_for(self._exchange(message), self._timeout)
+                completed = True
+                return reply
+            except (OSError, asyncio.IncompleteReadError, ValueError) as err:
+                if not fresh:
+                    continue  # stale keep-alive connection
+                raise aiohttp.ServerDisconnectedError(str(err) or None) from err
+            finally:
+                if not completed:
+                    # a half-read reply would be read by the next request
+                    self._disconnect()
+
+    async def _connect(self):
+        """Open a new connection to the device."""
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self._host, self._port), self._timeout
+            )
+        except OSError as err:
+            raise aiohttp.ClientConnectionError(
+                f"Cannot connect to {self._host}:{self._port}: {err}"
+            ) from err
+
+    async def _exchange(self, message):
+        """Write a request and read the complete response body."""
+        self._writer.write(message)
+        reader = self._reader
+        status = await reader.readuntil(b"\r\n")
+        if not status.startswith(b"HTTP/1."):
+            raise ValueError("Invalid status line")
+        length = None
+        chunked = close = False
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            value = value.strip().lower()
+            if name == b"content-length":
+                length = int(value)
+            elif name == b"transfer-encoding":
+                chunked = value == b"chunked"
+            elif name == b"connection":
+                close = value == b"close"
+        if chunked:
+            body = bytearray()
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if not size:
+                    break
+                body += chunk[:-2]
+            body = bytes(body)
+        elif length is not None:
+            body = await reader.readexactly(length)
+        else:
+            body = await reader.read()
+            close = True
+        if close:
+            self._disconnect()
+        return body
+
+    def _disconnect(self):
+        """Drop the current connection."""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def close(self):
+        """Close the connection."""
+        self._disconnect()
+
+
+TRANSPORTS = {"aiohttp": AiohttpTransport, "stream": StreamTransport}
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Benchmark pyatag hot paths against a simulated device farm.
+
+Scenarios: parse (Report processing), update (fleet retrieve sweeps),
+setter (fleet control writes) and discovery (UDP broadcast intake).
+replay feeds a recorded trace through many virtual devices and only
+runs when named, with --trace.
+The farm runs in a separate process so client CPU and memory are
+measured on their own.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pyatag import AtagFleet  # noqa: E402
+from pyatag.discovery import Discovery  # noqa: E402
+from pyatag.entities import Report  # noqa: E402
+from pyatag.metrics import Metrics  # noqa: E402
+from pyatag.pacing import Pacer, TokenBucket  # noqa: E402
+from pyatag.simulator import DeviceFarm, SimulatedDevice, raise_file_limit  # noqa: E402
+from pyatag.trace import Replay, read_trace  # noqa: E402
+
+
+class Result:
+    """Timings and resource use of one scenario."""
+
+    def __init__(self, name, samples, wall, cpu):
+        """Initiate result from latency samples in seconds."""
+        self.name = name
+        self.samples = sorted(samples)
+        self.wall = wall
+        self.cpu = cpu
+        self.maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def percentile(self, q):
+        """Return the latency at quantile q."""
+        if not self.samples:
+            return 0.0
+        return self.samples[min(len(self.samples) - 1, int(q * len(self.samples)))]
+
+    def as_dict(self):
+        """Return the result as plain data."""
+        return {
+            "scenario": self.name,
+            "ops": len(self.samples),
+            "throughput": len(self.samples) / self.wall if self.wall else 0.0,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "cpu_s": self.cpu,
+            "maxrss_kb": self.maxrss,
+        }
+
+    def __str__(self):
+        """Return a table row."""
+        data = self.as_dict()
+        return (
+            f"{self.name:<10} {data['ops']:>8} {data['throughput']:>10.1f} "
+            f"{data['p50_ms']:>9.3f} {data['p99_ms']:>9.3f} "
+            f"{data['cpu_s']:>7.2f} {data['maxrss_kb']:>10}"
+        )
+
+
+SCENARIOS = ["parse", "update", "setter", "discovery"]
+HEADER = (
+    f"{'scenario':<10} {'ops':>8} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} "
+    f"{'cpu s':>7} {'maxrss kB':>10}"
+)
+
+
+def measure(name, func):
+    """Run a scenario returning latency samples and wrap it in a Result."""
+    wall, cpu = time.perf_counter(), time.process_time()
+    samples = func()
+    return Result(name, samples, time.perf_counter() - wall, time.process_time() - cpu)
+
+
+def bench_parse(args):
+    """Time building and updating Report objects from retrieve replies."""
+    device = SimulatedDevice("0000-0000-0000_00-00-000-000")
+    replies = []
+    for _ in range(args.rounds * args.devices):
+        reply = device.retrieve_reply(127)["retrieve_reply"]
+        reply["report"].update(reply["report"].pop("details"))
+        replies.append(reply)
+    report = Report(replies[0], None, None)
+    samples = []
+    for reply in replies:
+        start = time.perf_counter()
+        report.update(reply)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def bench_fleet(args, action):
+    """Time retrieve or control sweeps over every farm device."""
+    farm = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-m",
+        "pyatag.simulator",
+        f"--devices={args.devices}",
+        f"--port={args.port}",
+        f"--latency={args.latency}",
+        f"--disconnect-rate={args.disconnect_rate}",
+        stdout=asyncio.subprocess.PIPE,
+        cwd=os.path.join(os.path.dirname(__file__), ".."),
+    )
+    await farm.stdout.readline()  # ready
+    samples = []
+    metrics = Metrics()
+    metrics.hooks.append(
+        lambda device, path, name, value: name == "total" and samples.append(value)
+    )
+    try:
+        async with AtagFleet(
+            concurrency=args.concurrency, transport=args.transport
+        ) as fleet:
+            for i in range(args.devices):
+                fleet.add(
+                    "127.0.0.1",
+                    device="known",
+                    port=args.port + i,
+                    pacer=TokenBucket(args.pacing) if args.pacing else Pacer(),
+                    metrics=metrics,
+                )
+            await fleet.update_all()  # warm up connections and reports
+            samples.clear()
+            for i in range(args.rounds):
+                if action == "update":
+                    await fleet.update_all()
+                else:
+                    await fleet.sweep(
+                        lambda atag: atag.setter(ch_mode_temp=18 + i % 4)
+                    )
+    finally:
+        farm.terminate()
+        await farm.wait()
+    return samples
+
+
+async def bench_discovery(args):
+    """Time until every broadcasting device is in the discovery table."""
+    farm = DeviceFarm(args.devices)
+    samples = []
+    for _ in range(args.rounds):
+        async with Discovery(port=args.udp_port) as discovery:
+            start = time.perf_counter()
+            farm.broadcast(args.udp_port)
+            while len(discovery.devices) < args.devices:
+                if time.perf_counter() - start > 5:
+                    break
+                await asyncio.sleep(0.001)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def bench_replay(args):
+    """Time recorded calls replayed through virtual devices."""
+    samples = []
+    metrics = Metrics()
+    metrics.hooks.append(
+        lambda device, path, name, value: name == "total" and samples.append(value)
+    )
+    speed = args.speed or None
+    async with Replay(
+        read_trace(args.trace), args.devices, speed, args.rounds, metrics=metrics
+    ) as replay:
+        await replay.run()
+    return samples
+
+
+def main():
+    """Run the selected benchmark scenarios."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", help=", ".join(SCENARIOS))
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--port", type=int, default=30000)
+    parser.add_argument("--udp-port", type=int, default=11001)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--disconnect-rate", type=float, default=0.0)
+    parser.add_argument("--pacing", type=float, default=0.0, help="requests/s")
+    parser.add_argument("--transport", default="aiohttp", choices=["aiohttp", "stream"])
+    parser.add_argument("--trace", help="trace file for the replay scenario")
+    parser.add_argument("--speed", type=float, default=0.0, help="replay speed")
+    parser.add_argument("--json", action="store_true", help="print JSON lines")
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS + ["replay"]:
+            parser.error(f"unknown scenario {name}")
+    if "replay" in args.scenarios and not args.trace:
+        parser.error("replay needs --trace")
+    raise_file_limit()
+
+    runs = {
+        "parse": lambda: bench_parse(args),
+        "update": lambda: asyncio.run(bench_fleet(args, "update")),
+        "setter": lambda: asyncio.run(bench_fleet(args, "setter")),
+        "discovery": lambda: asyncio.run(bench_discovery(args)),
+        "replay": lambda: asyncio.run(bench_replay(args)),
+    }
+    if not args.json:
+        print(HEADER)
+    for name in args.scenarios or SCENARIOS:
+        result = measure(name, runs[name])
+        print(json.dumps(result.as_dict()) if args.json else result, flush=True)
+
+
+if __name__ == "__main__":
+    main()
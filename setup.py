@@ -13,6 +13,7 @@ setup(
     zip_safe=True,
     platforms="any",
     install_requires=list(val.strip() for val in open("requirements.txt")),
+    extras_require={"fast": ["orjson"]},
     classifiers=[
         "Intended Audience :: Developers",
         "Operating System :: OS Independent",